@@ -5,11 +5,12 @@ Main FastAPI application entry point.
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pathlib import Path
 
 from src.core.config import settings
 from src.core.database import init_db
+from src.services.purge_service import purge_worker
+from src.utils.file_storage import shutdown_image_pool
+from src.utils.storage import get_storage
 from src.api import auth, products, users, orders, admin, demo
 
 # Create FastAPI application
@@ -35,6 +36,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Initialize database on startup
@@ -78,16 +80,29 @@ async def startup_event():
     init_db()
     print("✅ Database tables verified")
     
+    try:
+        await get_storage().prepare()
+        print(f"✅ Image storage ready ({settings.storage_backend})")
+    except Exception as e:
+        print(f"❌ Image storage check failed: {e}")
+    
+    purge_worker.start()
+    
     if settings.environment == "development":
         print("🔧 Running in DEVELOPMENT mode")
         print("📝 Login with mock accounts at: POST /api/auth/login")
         print("📝 Mock users available at: GET /api/auth/mock-users")
 
 
-# Mount static files for uploads
-UPLOAD_DIR = Path("/app/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the purge job and the image processing workers"""
+    await purge_worker.stop()
+    shutdown_image_pool()
+
+
+# Mount uploaded images (files on local storage, redirects to the bucket on S3)
+app.mount("/uploads", get_storage().asgi_app(), name="uploads")
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
@@ -113,16 +128,14 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    from src.core.database import SessionLocal
+    from src.core.database import AsyncSessionLocal
     from src.models import User
+    from sqlalchemy import func, select
     import os
     
     # Count users in database
-    db = SessionLocal()
-    try:
-        user_count = db.query(User).count()
-    finally:
-        db.close()
+    async with AsyncSessionLocal() as db:
+        user_count = await db.scalar(select(func.count(User.id)))
     
     return {
         "status": "healthy",
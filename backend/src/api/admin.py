@@ -1,23 +1,85 @@
 """Admin API routes"""
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
+from datetime import datetime
+import time
 
-from src.core.database import get_db
+from src.core.config import settings
+from src.core.database import get_async_db
+from src.core.pagination import paginate, set_next_cursor
 from src.core.security import get_admin_user
-from src.models import User, Product, ProductVariant, InventoryLot, Order, CreditLedger
+from src.core.principal_cache import invalidate_user
+from src.models import User, Product, ProductVariant, InventoryLot, Order, CreditLedger, LIVE_VARIANT
 from src.schemas.schemas import (
-    UserResponse, ProductResponse, VariantResponse, OrderResponse,
+    UserResponse, UserUpdate, ProductResponse, VariantResponse, OrderResponse,
     CreditGrant, BulkCreditGrant, UserImport, ProductCreate, ProductUpdate, CreditLedgerResponse,
     VariantCreate, VariantUpdate, VariantWithInventory, OrderWithUserResponse,
-    OrderItemWithDetails
+    OrderItemWithDetails, ImageUploadRequest, ImageUploadResponse, BatchOrderAction
+)
+from src.services.credit_service import (
+    grant_credits, bulk_grant_credits, get_user_balance, reconcile_balances
+)
+from src.services.allocation_service import run_annual_allocation
+from src.services.catalog_snapshot_service import publish_catalog_change
+from src.services.export_service import (
+    EXPORT_MEDIA_TYPES, export_filename, stream_ledger_export, stream_orders_export
+)
+from src.services.inventory_service import (
+    get_low_stock_variants, get_stock_overview, get_variants_with_availability
+)
+from src.services.order_listing_service import (
+    fast_json_response, load_order_payloads, order_rows_query
+)
+from src.services.purge_service import purge_empty_orders, purge_in_batches, purge_worker, release_image
+from src.services.reservation_service import invalidate_counters
+from src.services.stock_events_service import publish_stock_changes, stock_event_stream
+from src.services.user_import_service import (
+    IMPORT_FORMATS, detect_import_format, import_users_stream
+)
+from src.utils.file_storage import (
+    confirm_direct_upload, presign_image_upload, save_upload_file
 )
-from src.services.credit_service import grant_credits, get_user_balance
-from src.utils.file_storage import save_upload_file, delete_file
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Largest number of orders one batch fulfil/deny call may carry
+BATCH_ORDER_LIMIT = 1000
+
+
+async def _resolve_image(image: Optional[UploadFile], image_url: Optional[str]) -> Optional[str]:
+    """Store an image sent through the API, or check one uploaded straight to storage"""
+    if image and image_url:
+        raise HTTPException(status_code=400, detail="Send either image or image_url, not both")
+    try:
+        if image:
+            return await save_upload_file(image)
+        if image_url:
+            return await confirm_direct_upload(image_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return None
+
+
+@router.post("/uploads/presign", response_model=ImageUploadResponse)
+async def presign_image_upload_endpoint(
+    request: ImageUploadRequest,
+    admin_user: User = Depends(get_admin_user)
+):
+    """
+    Get a presigned URL to upload a product image straight to storage (admin only)
+    
+    Send the image's SHA-256 (hex), then PUT the bytes to upload_url with the
+    returned headers, and create or update the product with image_url.
+    """
+    try:
+        return await presign_image_upload(request.content_type, request.size, request.sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.post("/products", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
@@ -25,17 +87,12 @@ async def create_product(
     description: Optional[str] = Form(None),
     base_credits: float = Form(...),
     image: Optional[UploadFile] = File(None),
+    image_url: Optional[str] = Form(None),
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create a new product with optional image upload (admin only)"""
-    # Handle image upload
-    image_url = None
-    if image:
-        try:
-            image_url = await save_upload_file(image)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+    """Create a new product with an optional image, uploaded here or presigned (admin only)"""
+    image_url = await _resolve_image(image, image_url)
     
     # Create product
     db_product = Product(
@@ -45,8 +102,9 @@ async def create_product(
         image_url=image_url
     )
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.commit()
+    await db.refresh(db_product)
+    await publish_catalog_change()
     return db_product
 
 
@@ -57,13 +115,14 @@ async def update_product(
     description: Optional[str] = Form(None),
     base_credits: Optional[float] = Form(None),
     image: Optional[UploadFile] = File(None),
+    image_url: Optional[str] = Form(None),
     is_active: Optional[bool] = Form(None),
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Update a product with optional new image upload (admin only)"""
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if not db_product:
+    """Update a product with an optional new image, uploaded here or presigned (admin only)"""
+    db_product = await db.get(Product, product_id)
+    if not db_product or db_product.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Update fields
@@ -76,19 +135,19 @@ async def update_product(
     if is_active is not None:
         db_product.is_active = is_active
     
-    # Handle image upload
-    if image:
-        # Delete old image if exists
-        if db_product.image_url:
-            delete_file(db_product.image_url)
-        
-        try:
-            db_product.image_url = await save_upload_file(image)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-    
-    db.commit()
-    db.refresh(db_product)
+    # Handle image upload (the old image is only removed once the new one is stored)
+    old_image_url = None
+    new_image_url = await _resolve_image(image, image_url)
+    if new_image_url:
+        if db_product.image_url != new_image_url:
+            old_image_url = db_product.image_url
+        db_product.image_url = new_image_url
+    
+    await db.commit()
+    await db.refresh(db_product)
+    if old_image_url:
+        await release_image(db, old_image_url)
+    await publish_catalog_change()
     return db_product
 
 
@@ -96,73 +155,42 @@ async def update_product(
 async def delete_product(
     product_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Delete a product and all related data including order history (admin only)"""
-    from src.models import OrderItem
-    
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if not db_product:
+    """
+    Delete a product and all related data including order history (admin only)
+    
+    The product and its variants are soft-deleted and leave the catalog at
+    once; the purge job removes them, their order items, orders left empty
+    and unused images in the background.
+    """
+    db_product = await db.get(Product, product_id)
+    if not db_product or db_product.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Get all variant IDs for this product
-    variant_ids = [variant.id for variant in db_product.variants]
+    deleted_at = datetime.utcnow()
+    db_product.deleted_at = deleted_at
+    result = await db.execute(
+        update(ProductVariant).where(
+            ProductVariant.product_id == product_id, LIVE_VARIANT
+        ).values(deleted_at=deleted_at).returning(ProductVariant.id)
+    )
+    variant_ids = list(result.scalars().all())
+    await db.commit()
     
-    if variant_ids:
-        # Find all orders that contain these variants
-        affected_order_ids = db.query(OrderItem.order_id).filter(
-            OrderItem.variant_id.in_(variant_ids)
-        ).distinct().all()
-        affected_order_ids = [order_id[0] for order_id in affected_order_ids]
-        
-        # Delete all order items that reference these variants
-        db.query(OrderItem).filter(OrderItem.variant_id.in_(variant_ids)).delete(synchronize_session=False)
-        
-        # Delete orders that now have no items left
-        if affected_order_ids:
-            for order_id in affected_order_ids:
-                remaining_items = db.query(OrderItem).filter(OrderItem.order_id == order_id).count()
-                if remaining_items == 0:
-                    # Order has no items left, delete it
-                    order = db.query(Order).filter(Order.id == order_id).first()
-                    if order:
-                        # Also delete any credit ledger entries associated with this order
-                        db.query(CreditLedger).filter(CreditLedger.reference_order_id == order_id).delete(synchronize_session=False)
-                        db.delete(order)
-    
-    # Delete associated image if exists
-    if db_product.image_url:
-        delete_file(db_product.image_url)
-    
-    # Delete the product (will cascade delete variants and inventory lots)
-    db.delete(db_product)
-    db.commit()
-    return {"message": "Product and all related data deleted successfully"}
+    await invalidate_counters(variant_ids)
+    await publish_catalog_change()
+    purge_worker.wake()
+    return {"message": "Product deleted; related data is being purged in the background"}
 
 
 @router.post("/orders/cleanup-empty")
 async def cleanup_empty_orders(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Clean up orders that have no items (admin only) - one-time cleanup utility"""
-    from src.models import OrderItem
-    
-    # Find all orders
-    all_orders = db.query(Order).all()
-    deleted_count = 0
-    
-    for order in all_orders:
-        # Check if order has any items
-        item_count = db.query(OrderItem).filter(OrderItem.order_id == order.id).count()
-        if item_count == 0:
-            # Delete credit ledger entries associated with this order
-            db.query(CreditLedger).filter(CreditLedger.reference_order_id == order.id).delete(synchronize_session=False)
-            # Delete the empty order
-            db.delete(order)
-            deleted_count += 1
-    
-    db.commit()
+    """Clean up orders that have no items, in batches (admin only)"""
+    deleted_count = await purge_in_batches(purge_empty_orders)
     return {"message": f"Cleaned up {deleted_count} empty order(s)", "deleted_count": deleted_count}
 
 
@@ -171,12 +199,12 @@ async def create_variant(
     product_id: int,
     variant_data: VariantCreate,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add variant to product (admin only)"""
     # Check product exists
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    product = await db.get(Product, product_id)
+    if not product or product.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Create variant
@@ -187,7 +215,7 @@ async def create_variant(
         credits_modifier=variant_data.credits_modifier
     )
     db.add(variant)
-    db.flush()  # Get variant ID
+    await db.flush()  # Get variant ID
     
     # Create inventory lot if quantity specified
     if variant_data.quantity > 0:
@@ -197,8 +225,9 @@ async def create_variant(
         )
         db.add(inventory)
     
-    db.commit()
-    db.refresh(variant)
+    await db.commit()
+    await db.refresh(variant)
+    await publish_catalog_change()
     return variant
 
 
@@ -206,32 +235,14 @@ async def create_variant(
 async def get_product_variants(
     product_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all variants for a product with inventory info (admin only)"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    product = await db.get(Product, product_id)
+    if not product or product.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    variants = []
-    for variant in product.variants:
-        # Calculate available quantity
-        total_quantity = sum(lot.quantity for lot in variant.inventory_lots)
-        reserved_quantity = sum(lot.reserved_quantity for lot in variant.inventory_lots)
-        available_quantity = total_quantity - reserved_quantity
-        
-        variant_dict = {
-            "id": variant.id,
-            "product_id": variant.product_id,
-            "size": variant.size,
-            "color": variant.color,
-            "credits_modifier": variant.credits_modifier,
-            "created_at": variant.created_at,
-            "available_quantity": available_quantity
-        }
-        variants.append(variant_dict)
-    
-    return variants
+    return await get_variants_with_availability(db, product_id)
 
 
 @router.put("/products/{product_id}/variants/{variant_id}", response_model=VariantResponse)
@@ -240,13 +251,17 @@ async def update_variant(
     variant_id: int,
     variant_update: VariantUpdate,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a variant (admin only)"""
-    variant = db.query(ProductVariant).filter(
-        ProductVariant.id == variant_id,
-        ProductVariant.product_id == product_id
-    ).first()
+    result = await db.execute(
+        select(ProductVariant).where(
+            ProductVariant.id == variant_id,
+            ProductVariant.product_id == product_id,
+            LIVE_VARIANT
+        )
+    )
+    variant = result.scalar_one_or_none()
     
     if not variant:
         raise HTTPException(status_code=404, detail="Variant not found")
@@ -261,9 +276,10 @@ async def update_variant(
     
     # Update inventory if quantity specified
     if variant_update.quantity is not None:
-        inventory = db.query(InventoryLot).filter(
-            InventoryLot.variant_id == variant_id
-        ).first()
+        result = await db.execute(
+            select(InventoryLot).where(InventoryLot.variant_id == variant_id)
+        )
+        inventory = result.scalars().first()
         
         if inventory:
             inventory.quantity = variant_update.quantity
@@ -274,8 +290,13 @@ async def update_variant(
             )
             db.add(inventory)
     
-    db.commit()
-    db.refresh(variant)
+    await db.commit()
+    await db.refresh(variant)
+    
+    if variant_update.quantity is not None:
+        await invalidate_counters([variant_id])
+        await publish_stock_changes(db, [variant_id], "variant_updated")
+    await publish_catalog_change()
     return variant
 
 
@@ -284,19 +305,26 @@ async def delete_variant(
     product_id: int,
     variant_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Delete a variant (admin only)"""
-    variant = db.query(ProductVariant).filter(
-        ProductVariant.id == variant_id,
-        ProductVariant.product_id == product_id
-    ).first()
+    """Delete a variant; it is soft-deleted now and purged in the background (admin only)"""
+    result = await db.execute(
+        select(ProductVariant).where(
+            ProductVariant.id == variant_id,
+            ProductVariant.product_id == product_id,
+            LIVE_VARIANT
+        )
+    )
+    variant = result.scalar_one_or_none()
     
     if not variant:
         raise HTTPException(status_code=404, detail="Variant not found")
     
-    db.delete(variant)
-    db.commit()
+    variant.deleted_at = datetime.utcnow()
+    await db.commit()
+    await invalidate_counters([variant_id])
+    await publish_catalog_change()
+    purge_worker.wake()
     return {"message": "Variant deleted successfully"}
 
 
@@ -306,18 +334,32 @@ async def update_inventory(
     variant_id: int,
     quantity: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update inventory for a variant (admin only)"""
-    inventory = db.query(InventoryLot).filter(
-        InventoryLot.variant_id == variant_id
-    ).first()
+    variant = await db.scalar(
+        select(ProductVariant.id).where(
+            ProductVariant.id == variant_id,
+            ProductVariant.product_id == product_id,
+            LIVE_VARIANT
+        )
+    )
+    if not variant:
+        raise HTTPException(status_code=404, detail="Variant not found")
+    
+    result = await db.execute(
+        select(InventoryLot).where(InventoryLot.variant_id == variant_id)
+    )
+    inventory = result.scalars().first()
     if not inventory:
         inventory = InventoryLot(variant_id=variant_id, quantity=quantity)
         db.add(inventory)
     else:
         inventory.quantity = quantity
-    db.commit()
+    await db.commit()
+    await invalidate_counters([variant_id])
+    await publish_stock_changes(db, [variant_id], "adjusted")
+    await publish_catalog_change()
     return {"message": "Inventory updated", "quantity": quantity}
 
 
@@ -325,10 +367,10 @@ async def update_inventory(
 async def grant_credits_admin(
     grant_data: CreditGrant,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Grant credits to a user (admin only)"""
-    ledger_entry = grant_credits(
+    ledger_entry = await grant_credits(
         db,
         grant_data.user_id,
         grant_data.amount,
@@ -341,32 +383,19 @@ async def grant_credits_admin(
 async def bulk_grant_credits_admin(
     grant_data: BulkCreditGrant,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
-):
-    """Grant CapyCoins to multiple users at once (admin only)"""
-    ledger_entries = []
-    successful_users = []
-    failed_users = []
-    
-    for user_id in grant_data.user_ids:
-        try:
-            # Verify user exists
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                failed_users.append({"user_id": user_id, "reason": "User not found"})
-                continue
-            
-            # Grant CapyCoins
-            ledger_entry = grant_credits(
-                db,
-                user_id,
-                grant_data.amount,
-                grant_data.description
-            )
-            ledger_entries.append(ledger_entry.id)
-            successful_users.append({"user_id": user_id, "user_name": user.name})
-        except Exception as e:
-            failed_users.append({"user_id": user_id, "reason": str(e)})
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Grant CapyCoins to multiple users at once in a single transaction (admin only)"""
+    successful, failed_users = await bulk_grant_credits(
+        db,
+        grant_data.user_ids,
+        grant_data.amount,
+        grant_data.description
+    )
+    successful_users = [
+        {"user_id": entry["user_id"], "user_name": entry["user_name"]}
+        for entry in successful
+    ]
     
     return {
         "message": f"CapyCoins granted to {len(successful_users)} user(s)",
@@ -374,15 +403,41 @@ async def bulk_grant_credits_admin(
         "failed_count": len(failed_users),
         "successful_users": successful_users,
         "failed_users": failed_users,
-        "ledger_entry_ids": ledger_entries
+        "ledger_entry_ids": [entry["ledger_entry_id"] for entry in successful]
     }
 
 
+@router.post("/credits/reconcile")
+async def reconcile_credit_balances(
+    apply: bool = False,
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Compare materialized balances with the ledger; optionally repair drift (admin only)"""
+    drift = await reconcile_balances(db, apply=apply)
+    return {
+        "drifted_count": len(drift),
+        "applied": apply,
+        "drift": drift
+    }
+
+
+@router.post("/credits/allocate")
+async def allocate_annual_credits(
+    year: Optional[int] = None,
+    dry_run: bool = False,
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Run the yearly CapyCoin allocation; safe to re-run for the same year (admin only)"""
+    return await run_annual_allocation(db, year or datetime.utcnow().year, dry_run=dry_run)
+
+
 @router.post("/users/import")
 async def import_users(
     users_data: List[dict],
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Import users from CSV (admin only)"""
     imported = []
@@ -391,189 +446,182 @@ async def import_users(
         db.add(user)
         imported.append(user)
     
-    db.commit()
+    await db.commit()
     return {"message": f"{len(imported)} users imported", "count": len(imported)}
 
 
+@router.post("/users/import/stream")
+async def import_users_stream_endpoint(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    grant_initial_credits: bool = Form(False),
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Import users from a CSV or NDJSON upload with batched upserts on email (admin only)"""
+    fmt = format or detect_import_format(file.filename, file.content_type)
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Allowed: {', '.join(IMPORT_FORMATS)}")
+    
+    try:
+        return await import_users_stream(db, file.file, fmt, grant_initial_credits)
+    finally:
+        await file.close()
+
+
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
+    response: Response,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None
 ):
-    """Get all users (admin only)"""
-    users = db.query(User).offset(skip).limit(limit).all()
+    """Get all users, oldest first, with offset or cursor paging (admin only)"""
+    result = await db.execute(
+        paginate(select(User), User, limit, cursor, skip, descending=False)
+    )
+    users = result.scalars().all()
+    set_next_cursor(response, users, limit)
     return users
 
 
+@router.put("/users/{user_id}", response_model=UserResponse)
+async def update_user(
+    user_id: int,
+    user_update: UserUpdate,
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update a user's name, role or active flag (admin only)"""
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if user_update.name is not None:
+        user.name = user_update.name
+    if user_update.role is not None:
+        user.role = user_update.role
+    if user_update.is_active is not None:
+        user.is_active = user_update.is_active
+    
+    await db.commit()
+    await db.refresh(user)
+    
+    # Cached principals must not outlive a deactivation or role change
+    await invalidate_user(user.email)
+    return user
+
+
 @router.get("/orders", response_model=List[OrderWithUserResponse])
 async def get_all_orders(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
-    limit: int = 100
-):
-    """Get all orders with user and product details (admin only)"""
-    from src.models import Product, ProductVariant
-    
-    orders = db.query(Order).order_by(
-        Order.created_at.desc()
-    ).offset(skip).limit(limit).all()
-    
-    # Enrich orders with user and product details
-    enriched_orders = []
-    for order in orders:
-        order_dict = {
-            'id': order.id,
-            'user_id': order.user_id,
-            'user': order.user,
-            'status': order.status,
-            'total_credits': order.total_credits,
-            'created_at': order.created_at,
-            'updated_at': order.updated_at,
-            'completed_at': order.completed_at,
-            'items': []
-        }
-        
-        # Enrich order items with product/variant details
-        for item in order.items:
-            variant = db.query(ProductVariant).filter(ProductVariant.id == item.variant_id).first()
-            product = None
-            if variant:
-                product = db.query(Product).filter(Product.id == variant.product_id).first()
-            
-            item_dict = {
-                'id': item.id,
-                'order_id': item.order_id,
-                'variant_id': item.variant_id,
-                'quantity': item.quantity,
-                'unit_credits': item.unit_credits,
-                'total_credits': item.total_credits,
-                'created_at': item.created_at,
-                'product_name': product.name if product else None,
-                'variant_size': variant.size if variant else None,
-                'variant_color': variant.color if variant else None
-            }
-            order_dict['items'].append(item_dict)
-        
-        enriched_orders.append(order_dict)
-    
-    return enriched_orders
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """Get all orders with user and product details, newest first (admin only)"""
+    orders = await load_order_payloads(
+        db, paginate(order_rows_query(), Order, limit, cursor, skip)
+    )
+    response = fast_json_response(orders)
+    set_next_cursor(response, orders, limit)
+    return response
 
 
 @router.get("/orders/processing", response_model=List[OrderWithUserResponse])
 async def get_processing_orders(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all processing (approved, awaiting fulfillment) orders with user and product details (admin only)"""
-    from src.models import OrderStatus, Product, ProductVariant
-    
-    orders = db.query(Order).filter(
-        Order.status == OrderStatus.PROCESSING
-    ).order_by(Order.created_at.desc()).all()
-    
-    # Enrich orders with user and product details
-    enriched_orders = []
-    for order in orders:
-        order_dict = {
-            'id': order.id,
-            'user_id': order.user_id,
-            'user': order.user,
-            'status': order.status,
-            'total_credits': order.total_credits,
-            'created_at': order.created_at,
-            'updated_at': order.updated_at,
-            'completed_at': order.completed_at,
-            'items': []
-        }
-        
-        # Enrich order items with product/variant details
-        for item in order.items:
-            variant = db.query(ProductVariant).filter(ProductVariant.id == item.variant_id).first()
-            product = None
-            if variant:
-                product = db.query(Product).filter(Product.id == variant.product_id).first()
-            
-            item_dict = {
-                'id': item.id,
-                'order_id': item.order_id,
-                'variant_id': item.variant_id,
-                'quantity': item.quantity,
-                'unit_credits': item.unit_credits,
-                'total_credits': item.total_credits,
-                'created_at': item.created_at,
-                'product_name': product.name if product else None,
-                'variant_size': variant.size if variant else None,
-                'variant_color': variant.color if variant else None
-            }
-            order_dict['items'].append(item_dict)
-        
-        enriched_orders.append(order_dict)
+    from src.models import OrderStatus
     
-    return enriched_orders
+    orders = await load_order_payloads(
+        db,
+        order_rows_query().where(
+            Order.status == OrderStatus.PROCESSING
+        ).order_by(Order.created_at.desc(), Order.id.desc())
+    )
+    return fast_json_response(orders)
 
 
 # Backwards compatibility - redirect old pending endpoint to processing
 @router.get("/orders/pending", response_model=List[OrderWithUserResponse])
 async def get_pending_orders(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """DEPRECATED: Use /orders/processing instead. Get all pending orders (admin only)"""
     return await get_processing_orders(admin_user, db)
 
 
+def _batch_response(action: str, results: List[dict], started: float) -> dict:
+    succeeded = sum(1 for result in results if result["status"] != "failed")
+    return {
+        "message": f"{succeeded} order(s) {action}",
+        "successful_count": succeeded,
+        "failed_count": len(results) - succeeded,
+        "results": results,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _check_batch_size(batch: BatchOrderAction) -> None:
+    if not batch.order_ids:
+        raise HTTPException(status_code=400, detail="order_ids must not be empty")
+    if len(batch.order_ids) > BATCH_ORDER_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_ORDER_LIMIT} orders per batch")
+
+
+@router.post("/orders/batch/fulfill")
+async def batch_fulfill_orders(
+    batch: BatchOrderAction,
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Fulfill many processing orders in one transaction, with a result per order (admin only)"""
+    from src.services.order_service import fulfill_orders
+    
+    _check_batch_size(batch)
+    started = time.perf_counter()
+    results = await fulfill_orders(db, batch.order_ids)
+    return _batch_response("fulfilled", results, started)
+
+
+@router.post("/orders/batch/deny")
+async def batch_deny_orders(
+    batch: BatchOrderAction,
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Deny many processing orders in one transaction, refunding credits (admin only)"""
+    from src.services.order_service import deny_orders
+    
+    _check_batch_size(batch)
+    started = time.perf_counter()
+    results = await deny_orders(db, batch.order_ids, batch.reason)
+    return _batch_response("denied", results, started)
+
+
 @router.post("/orders/{order_id}/fulfill", response_model=OrderWithUserResponse)
 async def fulfill_order_endpoint(
     order_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Fulfill an approved order - deducts inventory and marks as completed (admin only)"""
     from src.services.order_service import fulfill_order
-    from src.models import Product, ProductVariant
     
     try:
-        order = fulfill_order(db, order_id)
-        
-        # Enrich with user and product details
-        order_dict = {
-            'id': order.id,
-            'user_id': order.user_id,
-            'user': order.user,
-            'status': order.status,
-            'total_credits': order.total_credits,
-            'created_at': order.created_at,
-            'updated_at': order.updated_at,
-            'completed_at': order.completed_at,
-            'items': []
-        }
-        
-        for item in order.items:
-            variant = db.query(ProductVariant).filter(ProductVariant.id == item.variant_id).first()
-            product = None
-            if variant:
-                product = db.query(Product).filter(Product.id == variant.product_id).first()
-            
-            item_dict = {
-                'id': item.id,
-                'order_id': item.order_id,
-                'variant_id': item.variant_id,
-                'quantity': item.quantity,
-                'unit_credits': item.unit_credits,
-                'total_credits': item.total_credits,
-                'created_at': item.created_at,
-                'product_name': product.name if product else None,
-                'variant_size': variant.size if variant else None,
-                'variant_color': variant.color if variant else None
-            }
-            order_dict['items'].append(item_dict)
-        
-        return order_dict
+        await fulfill_order(db, order_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    orders = await load_order_payloads(db, order_rows_query().where(Order.id == order_id))
+    return fast_json_response(orders[0])
 
 
 # Backwards compatibility - redirect old approve endpoint to fulfill
@@ -581,7 +629,7 @@ async def fulfill_order_endpoint(
 async def approve_order_endpoint(
     order_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """DEPRECATED: Use /fulfill instead. Approve a pending order - deducts credits and inventory (admin only)"""
     return await fulfill_order_endpoint(order_id, admin_user, db)
@@ -592,12 +640,12 @@ async def deny_order_endpoint(
     order_id: int,
     reason: Optional[str] = None,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Deny an approved order - releases reserved inventory and refunds credits (admin only)"""
     from src.services.order_service import deny_order
     try:
-        order = deny_order(db, order_id, reason)
+        order = await deny_order(db, order_id, reason)
         return {"message": "Order denied", "order_id": order_id, "status": order.status}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -609,7 +657,7 @@ async def reject_order_endpoint(
     order_id: int,
     reason: Optional[str] = None,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """DEPRECATED: Use /deny instead. Reject a pending order - releases reserved inventory (admin only)"""
     return await deny_order_endpoint(order_id, reason, admin_user, db)
@@ -619,132 +667,148 @@ async def reject_order_endpoint(
 async def get_user_credit_balance(
     user_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's credit balance (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    balance = get_user_balance(db, user_id)
+    balance = await get_user_balance(db, user_id)
     return {"user_id": user_id, "balance": balance}
 
 
 @router.get("/users/{user_id}/ledger", response_model=List[CreditLedgerResponse])
 async def get_user_credit_ledger(
     user_id: int,
+    response: Response,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    skip: int = 0,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
 ):
-    """Get user's credit ledger history (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    """Get user's credit ledger history, newest first; unpaged unless limit is given (admin only)"""
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    ledger = db.query(CreditLedger).filter(
-        CreditLedger.user_id == user_id
-    ).order_by(CreditLedger.created_at.desc()).all()
-    return ledger
+    result = await db.execute(
+        paginate(
+            select(CreditLedger).where(CreditLedger.user_id == user_id),
+            CreditLedger, limit, cursor, skip
+        )
+    )
+    entries = result.scalars().all()
+    set_next_cursor(response, entries, limit)
+    return entries
 
 
 @router.get("/users/{user_id}/orders", response_model=List[OrderResponse])
 async def get_user_orders(
     user_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's order history (perk history) (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    orders = db.query(Order).filter(
-        Order.user_id == user_id
-    ).order_by(Order.created_at.desc()).all()
-    return orders
+    result = await db.execute(
+        select(Order).options(selectinload(Order.items)).where(
+            Order.user_id == user_id
+        ).order_by(Order.created_at.desc())
+    )
+    return result.scalars().all()
+
+
+async def _export_response(db: AsyncSession, name: str, stream_export, fmt: str, start, end) -> StreamingResponse:
+    try:
+        body = stream_export(fmt, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The export reads through its own session; hand this one's connection back now
+    await db.close()
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_filename(name, fmt, start, end)}"',
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@router.get("/exports/orders")
+async def export_orders(
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+    format: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    Stream orders created in [start, end) with their items, oldest first (admin only)
+    
+    format=csv gives one row per order item; format=ndjson one order, with
+    its user and items, per line.
+    """
+    return await _export_response(db, "orders", stream_orders_export, format, start, end)
+
+
+@router.get("/exports/ledger")
+async def export_credit_ledger(
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+    format: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Stream credit ledger entries created in [start, end), oldest first, as CSV or NDJSON (admin only)"""
+    return await _export_response(db, "credit_ledger", stream_ledger_export, format, start, end)
 
 
 @router.get("/inventory/overview")
 async def get_inventory_overview(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get comprehensive inventory overview (admin only)"""
-    products = db.query(Product).filter(Product.is_active == True).all()
-    
-    inventory_data = []
-    for product in products:
-        product_info = {
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "base_credits": product.base_credits,
-            "image_url": product.image_url,
-            "total_variants": len(product.variants),
-            "variants": []
-        }
-        
-        total_stock = 0
-        total_reserved = 0
-        
-        for variant in product.variants:
-            variant_stock = sum(lot.quantity for lot in variant.inventory_lots)
-            variant_reserved = sum(lot.reserved_quantity for lot in variant.inventory_lots)
-            available = variant_stock - variant_reserved
-            
-            total_stock += variant_stock
-            total_reserved += variant_reserved
-            
-            variant_info = {
-                "id": variant.id,
-                "size": variant.size,
-                "color": variant.color,
-                "credits_modifier": variant.credits_modifier,
-                "total_stock": variant_stock,
-                "reserved": variant_reserved,
-                "available": available,
-                "stock_status": "out_of_stock" if available == 0 else ("low_stock" if available < 10 else "in_stock")
-            }
-            product_info["variants"].append(variant_info)
-        
-        product_info["total_stock"] = total_stock
-        product_info["total_reserved"] = total_reserved
-        product_info["total_available"] = total_stock - total_reserved
-        
-        inventory_data.append(product_info)
-    
-    return inventory_data
+    return await get_stock_overview(db)
 
 
 @router.get("/inventory/low-stock")
 async def get_low_stock_items(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db),
-    threshold: int = 10
+    db: AsyncSession = Depends(get_async_db),
+    threshold: int = settings.low_stock_threshold
 ):
     """Get products with low stock (admin only)"""
-    products = db.query(Product).filter(Product.is_active == True).all()
-    
-    low_stock_items = []
-    for product in products:
-        for variant in product.variants:
-            variant_stock = sum(lot.quantity for lot in variant.inventory_lots)
-            variant_reserved = sum(lot.reserved_quantity for lot in variant.inventory_lots)
-            available = variant_stock - variant_reserved
-            
-            if available < threshold and available >= 0:
-                low_stock_items.append({
-                    "product_id": product.id,
-                    "product_name": product.name,
-                    "variant_id": variant.id,
-                    "variant_size": variant.size,
-                    "variant_color": variant.color,
-                    "available": available,
-                    "reserved": variant_reserved,
-                    "total": variant_stock
-                })
-    
-    return sorted(low_stock_items, key=lambda x: x["available"])
+    return await get_low_stock_variants(db, threshold)
+
+
+@router.get("/inventory/events")
+async def stream_inventory_events(
+    request: Request,
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Server-Sent Events stream of stock changes and low-stock alerts (admin only)
+    
+    Starts with a low_stock_snapshot event, then relays stock_changed,
+    low_stock, out_of_stock and restocked events as inventory moves. Read it
+    with a streaming fetch (EventSource cannot send the Authorization header).
+    """
+    low_stock = await get_low_stock_variants(db, settings.low_stock_threshold)
+    # The stream outlives the request's session; hand its connection back now
+    await db.close()
+    return StreamingResponse(
+        stock_event_stream(request, low_stock),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/inventory/adjust")
@@ -753,16 +817,17 @@ async def adjust_inventory(
     adjustment: int,
     reason: str,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Adjust inventory quantity for a variant (admin only)"""
-    variant = db.query(ProductVariant).filter(ProductVariant.id == variant_id).first()
-    if not variant:
+    variant = await db.get(ProductVariant, variant_id)
+    if not variant or variant.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Variant not found")
     
-    inventory = db.query(InventoryLot).filter(
-        InventoryLot.variant_id == variant_id
-    ).first()
+    result = await db.execute(
+        select(InventoryLot).where(InventoryLot.variant_id == variant_id)
+    )
+    inventory = result.scalars().first()
     
     if not inventory:
         if adjustment < 0:
@@ -778,8 +843,11 @@ async def adjust_inventory(
             )
         inventory.quantity = new_quantity
     
-    db.commit()
-    db.refresh(inventory)
+    await db.commit()
+    await db.refresh(inventory)
+    await invalidate_counters([variant_id])
+    await publish_stock_changes(db, [variant_id], "adjusted")
+    await publish_catalog_change()
     
     return {
         "message": "Inventory adjusted",
@@ -1,16 +1,17 @@
 """Authentication API routes"""
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import msal
 import requests
 
-from src.core.database import get_db
+from src.core.database import get_async_db
 from src.core.config import settings
 from src.core.security import create_access_token
 from src.models import User, UserRole
 from src.schemas.schemas import Token, DevLoginRequest, LoginRequest
-from src.services.credit_service import grant_credits
+from src.services.allocation_service import grant_initial_allocation
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -45,19 +46,8 @@ MOCK_USERS = {
 }
 
 
-def get_initial_credits(role: UserRole) -> float:
-    """Get initial credits based on role"""
-    credit_map = {
-        UserRole.INTERN: 100.0,
-        UserRole.EMPLOYEE: 200.0,
-        UserRole.SENIOR: 300.0,
-        UserRole.ADMIN: 1000.0
-    }
-    return credit_map.get(role, 100.0)
-
-
 @router.post("/login", response_model=Token)
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Login with email and password
     - In development: validates against mock user accounts
@@ -85,7 +75,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
             )
         
         # Check if user exists in database
-        user = db.query(User).filter(User.email == email).first()
+        user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
         
         if not user:
             # Create new user in development
@@ -96,12 +86,11 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
                 role=mock_user["role"]
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
             
-            # Grant initial credits
-            credit_amount = get_initial_credits(user.role)
-            grant_credits(db, user.id, credit_amount, f"Initial credits for {user.role.value}")
+            # Grant initial credits (recorded as this year's allocation)
+            await grant_initial_allocation(db, user)
         
         # Create access token
         access_token = create_access_token(
@@ -145,7 +134,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
             name = claims.get("name", email.split('@')[0].title())
             
             # Check if user exists in database
-            user = db.query(User).filter(User.email == user_email).first()
+            user = (await db.execute(select(User).where(User.email == user_email))).scalar_one_or_none()
             
             if not user:
                 # Create new user
@@ -156,12 +145,11 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
                     role=UserRole.EMPLOYEE
                 )
                 db.add(user)
-                db.commit()
-                db.refresh(user)
+                await db.commit()
+                await db.refresh(user)
                 
-                # Grant initial credits
-                credit_amount = get_initial_credits(user.role)
-                grant_credits(db, user.id, credit_amount, f"Initial credits for {user.role.value}")
+                # Grant initial credits (recorded as this year's allocation)
+                await grant_initial_allocation(db, user)
             
             # Create access token
             access_token = create_access_token(
@@ -202,7 +190,7 @@ async def azure_login_url():
 
 
 @router.post("/callback", response_model=Token)
-async def azure_callback(code: str = None, db: Session = Depends(get_db)):
+async def azure_callback(code: str = None, db: AsyncSession = Depends(get_async_db)):
     """Handle Azure AD callback and create/update user"""
     # Development fallback
     if not code or not settings.azure_ad_client_id:
@@ -236,7 +224,7 @@ async def azure_callback(code: str = None, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Unable to extract email from Azure AD")
         
         # Check if user exists
-        user = db.query(User).filter(User.email == email).first()
+        user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
         
         if not user:
             # Create new user
@@ -247,12 +235,11 @@ async def azure_callback(code: str = None, db: Session = Depends(get_db)):
                 role=UserRole.EMPLOYEE
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
             
-            # Grant initial credits
-            credit_amount = get_initial_credits(user.role)
-            grant_credits(db, user.id, credit_amount, f"Initial credits for {user.role}")
+            # Grant initial credits (recorded as this year's allocation)
+            await grant_initial_allocation(db, user)
         
         # Create access token
         access_token = create_access_token(
@@ -266,7 +253,7 @@ async def azure_callback(code: str = None, db: Session = Depends(get_db)):
 
 
 @router.post("/dev/login", response_model=Token)
-async def dev_login(login_data: DevLoginRequest, db: Session = Depends(get_db)):
+async def dev_login(login_data: DevLoginRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Development login endpoint - bypass Azure AD authentication
     Allows logging in with just an email address
@@ -280,7 +267,7 @@ async def dev_login(login_data: DevLoginRequest, db: Session = Depends(get_db)):
     email = login_data.email.lower().strip()
     
     # Check if user exists
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
     
     if not user:
         # Create new user in development
@@ -291,12 +278,11 @@ async def dev_login(login_data: DevLoginRequest, db: Session = Depends(get_db)):
             role=UserRole.EMPLOYEE
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         
-        # Grant initial credits
-        credit_amount = get_initial_credits(user.role)
-        grant_credits(db, user.id, credit_amount, f"Initial credits for {user.role.value}")
+        # Grant initial credits (recorded as this year's allocation)
+        await grant_initial_allocation(db, user)
     
     # Create access token
     access_token = create_access_token(
@@ -328,7 +314,7 @@ async def get_mock_users():
 
 
 @router.get("/dev/users")
-async def get_dev_users(db: Session = Depends(get_db)):
+async def get_dev_users(db: AsyncSession = Depends(get_async_db)):
     """Get list of users for development login (deprecated - kept for backward compatibility)"""
     if settings.environment == "production":
         raise HTTPException(
@@ -336,7 +322,7 @@ async def get_dev_users(db: Session = Depends(get_db)):
             detail="Development endpoint disabled in production"
         )
     
-    users = db.query(User).filter(User.is_active == True).all()
+    users = (await db.execute(select(User).where(User.is_active == True))).scalars().all()
     result = [
         {
             "email": user.email,
@@ -350,8 +336,8 @@ async def get_dev_users(db: Session = Depends(get_db)):
     print(f"🔍 /api/auth/dev/users called - Returning {len(result)} users")
     if len(result) == 0:
         print("⚠️  WARNING: No users found in database!")
-        total_users = db.query(User).count()
-        active_users = db.query(User).filter(User.is_active == True).count()
+        total_users = await db.scalar(select(func.count(User.id)))
+        active_users = await db.scalar(select(func.count(User.id)).where(User.is_active == True))
         print(f"   Total users in DB: {total_users}")
         print(f"   Active users in DB: {active_users}")
     
@@ -1,13 +1,16 @@
 """Order management API routes"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 
-from src.core.database import get_db
+from src.core.database import get_async_db
+from src.core.pagination import paginate, set_next_cursor
 from src.core.security import get_current_user
 from src.models import User, Order, UserRole
 from src.schemas.schemas import OrderCreate, OrderResponse
-from src.services.order_service import process_order
+from src.services.order_service import process_order, get_order_with_items
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -16,11 +19,11 @@ router = APIRouter(prefix="/orders", tags=["Orders"])
 async def create_order(
     order_data: OrderCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new order"""
     try:
-        order = process_order(db, current_user, order_data)
+        order = await process_order(db, current_user, order_data)
         return order
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -28,17 +31,26 @@ async def create_order(
 
 @router.get("", response_model=List[OrderResponse])
 async def get_orders(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
-    limit: int = 50
+    limit: int = 50,
+    cursor: Optional[str] = None
 ):
-    """Get user's orders"""
-    orders = db.query(Order).filter(
-        Order.user_id == current_user.id
-    ).order_by(
-        Order.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    """Get user's orders (newest first; pass X-Next-Cursor back as cursor for the next page)"""
+    result = await db.execute(
+        paginate(
+            select(Order).options(
+                selectinload(Order.items)
+            ).where(
+                Order.user_id == current_user.id
+            ),
+            Order, limit, cursor, skip
+        )
+    )
+    orders = result.scalars().all()
+    set_next_cursor(response, orders, limit)
     return orders
 
 
@@ -46,10 +58,10 @@ async def get_orders(
 async def get_order(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get order details"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await get_order_with_items(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -57,4 +69,3 @@ async def get_order(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     return order
-
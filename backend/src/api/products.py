@@ -1,44 +1,104 @@
 """Product catalog API routes"""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
 
-from src.core.database import get_db
-from src.models import Product, ProductVariant
+from src.core.config import settings
+from src.core.database import get_async_db
+from src.core.pagination import NEXT_CURSOR_HEADER, next_cursor, paginate
+from src.models import LISTED_PRODUCT, Product, ProductVariant
 from src.schemas.schemas import ProductResponse, ProductWithInventory, VariantResponse
+from src.services.catalog_cache_service import cached_response, product_detail_key, serialize
+from src.services.catalog_snapshot_service import get_snapshot, snapshot_response
+from src.services.catalog_search_service import SEARCH_RESULT_LIMIT, search_products
+from src.services.inventory_service import get_variants_with_availability
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
 
 @router.get("", response_model=List[ProductResponse])
 async def get_products(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
 ):
-    """Get list of active products"""
-    products = db.query(Product).filter(
-        Product.is_active == True
-    ).offset(skip).limit(limit).all()
-    return products
+    """Get list of active products (oldest first, offset or cursor paging)"""
+    async def build() -> Tuple[bytes, Dict[str, str]]:
+        result = await db.execute(
+            paginate(
+                select(Product).where(LISTED_PRODUCT),
+                Product, limit, cursor, skip, descending=False
+            )
+        )
+        products = result.scalars().all()
+        cursor_after = next_cursor(products, limit)
+        headers = {NEXT_CURSOR_HEADER: cursor_after} if cursor_after else {}
+        return serialize(List[ProductResponse], products), headers
+    
+    return await cached_response(
+        f"products:list:{cursor or skip}:{limit}", build, if_none_match
+    )
+
+
+@router.get("/catalog", response_model=List[ProductWithInventory])
+async def get_catalog(
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get the whole active catalog with variants and stock, from the prebuilt snapshot"""
+    snapshot = await get_snapshot()
+    return snapshot_response(snapshot, accept_encoding, if_none_match)
+
+
+@router.get("/search", response_model=List[ProductResponse])
+async def search_catalog(
+    db: AsyncSession = Depends(get_async_db),
+    q: Optional[str] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_credits: Optional[float] = None,
+    max_credits: Optional[float] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(SEARCH_RESULT_LIMIT, ge=1, le=SEARCH_RESULT_LIMIT)
+):
+    """Search active products by text, variant size/color and effective credit range"""
+    return await search_products(
+        db, q=q, size=size, color=color,
+        min_credits=min_credits, max_credits=max_credits,
+        skip=skip, limit=limit
+    )
 
 
 @router.get("/{product_id}", response_model=ProductWithInventory)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Get product details with variants and inventory"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+async def get_product(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get product details with variants and their available quantity"""
+    async def build() -> Tuple[bytes, Dict[str, str]]:
+        product = await db.get(Product, product_id)
+        if not product or product.deleted_at is not None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        variants = await get_variants_with_availability(db, product_id)
+        return serialize(ProductWithInventory, ProductWithInventory(
+            **ProductResponse.model_validate(product).model_dump(),
+            variants=variants
+        )), {}
+    
+    return await cached_response(
+        product_detail_key(product_id), build, if_none_match,
+        ttl=settings.product_detail_cache_ttl_seconds
+    )
 
 
 @router.get("/variants/{variant_id}", response_model=VariantResponse)
-async def get_variant(variant_id: int, db: Session = Depends(get_db)):
+async def get_variant(variant_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get variant details with inventory"""
-    variant = db.query(ProductVariant).filter(
-        ProductVariant.id == variant_id
-    ).first()
-    if not variant:
+    variant = await db.get(ProductVariant, variant_id)
+    if not variant or variant.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Variant not found")
     return variant
-
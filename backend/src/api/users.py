@@ -1,9 +1,11 @@
 """User profile API routes"""
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from src.core.database import get_db
+from src.core.database import get_async_db
+from src.core.pagination import paginate, set_next_cursor
 from src.core.security import get_current_user
 from src.models import User, CreditLedger
 from src.schemas.schemas import UserResponse, CreditBalance, CreditLedgerResponse
@@ -21,25 +23,31 @@ async def get_me(current_user: User = Depends(get_current_user)):
 @router.get("/credits/balance", response_model=CreditBalance)
 async def get_credits_balance(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's credit balance"""
-    balance = get_user_balance(db, current_user.id)
+    balance = await get_user_balance(db, current_user.id)
     return {"balance": balance, "user_id": current_user.id}
 
 
 @router.get("/credits/ledger", response_model=List[CreditLedgerResponse])
 async def get_credits_ledger(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    """Get user's credit transaction history"""
-    ledger = db.query(CreditLedger).filter(
-        CreditLedger.user_id == current_user.id
-    ).order_by(
-        CreditLedger.created_at.desc()
-    ).offset(offset).limit(limit).all()
-    return ledger
-
+    """Get user's credit transaction history (newest first, offset or cursor paging)"""
+    result = await db.execute(
+        paginate(
+            select(CreditLedger).where(
+                CreditLedger.user_id == current_user.id
+            ),
+            CreditLedger, limit, cursor, offset
+        )
+    )
+    entries = result.scalars().all()
+    set_next_cursor(response, entries, limit)
+    return entries
@@ -18,6 +18,48 @@ class Settings:
     algorithm: str = os.getenv("ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     
+    # Principal cache (verified tokens in-process, user snapshots in Redis)
+    principal_cache_size: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+    principal_cache_ttl_seconds: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+    
+    # Inventory holds (Redis admission control in front of Postgres)
+    inventory_hold_ttl_seconds: int = int(os.getenv("INVENTORY_HOLD_TTL_SECONDS", "300"))
+    # Counters are reseeded from Postgres at least this often, so any drift heals itself
+    inventory_counter_ttl_seconds: int = int(os.getenv("INVENTORY_COUNTER_TTL_SECONDS", "1200"))
+    
+    # Stock events: variants with fewer available units than this raise low-stock alerts
+    low_stock_threshold: int = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+    
+    # Purge of soft-deleted products/variants: rows per batch, and seconds between
+    # background runs in each worker (0 disables them; run src.utils.purge_deleted instead)
+    purge_batch_size: int = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+    purge_interval_seconds: int = int(os.getenv("PURGE_INTERVAL_SECONDS", "300"))
+    
+    # Catalog response cache (entries are keyed by catalog version)
+    catalog_cache_ttl_seconds: int = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "86400"))
+    # Product detail embeds live availability, so it is also dropped on checkout/deny
+    product_detail_cache_ttl_seconds: int = int(os.getenv("PRODUCT_DETAIL_CACHE_TTL_SECONDS", "60"))
+    # Full-catalog snapshot is rebuilt on admin changes and at least this often (stock drift)
+    catalog_snapshot_max_age_seconds: int = int(os.getenv("CATALOG_SNAPSHOT_MAX_AGE_SECONDS", "30"))
+    
+    # Image storage: "local" (UPLOAD_DIR, shared by every replica) or "s3" (any S3-compatible store)
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "local")
+    upload_dir: str = os.getenv("UPLOAD_DIR", "/app/uploads")
+    # Uploads: when set (e.g. /_uploads/), the app hands file bodies to nginx via X-Accel-Redirect
+    uploads_accel_redirect: str = os.getenv("UPLOADS_ACCEL_REDIRECT", "")
+    
+    # S3 / MinIO (empty endpoint and keys mean AWS with the default credential chain)
+    s3_bucket: str = os.getenv("S3_BUCKET", "capyxperks-uploads")
+    s3_region: str = os.getenv("S3_REGION", "us-east-1")
+    s3_endpoint_url: str = os.getenv("S3_ENDPOINT_URL", "")
+    # Browser-reachable endpoint for presigned URLs, when it differs (e.g. http://localhost:9000)
+    s3_presign_endpoint_url: str = os.getenv("S3_PRESIGN_ENDPOINT_URL", "")
+    # Public bucket or CDN base URL; downloads then redirect there instead of being presigned
+    s3_public_url: str = os.getenv("S3_PUBLIC_URL", "")
+    s3_access_key_id: str = os.getenv("S3_ACCESS_KEY_ID", "")
+    s3_secret_access_key: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    s3_presign_expiry_seconds: int = int(os.getenv("S3_PRESIGN_EXPIRY_SECONDS", "900"))
+    
     # Application
     environment: str = os.getenv("ENVIRONMENT", "development")
     cors_origins: List[str] = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
@@ -1,17 +1,38 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import redis
+import redis.asyncio as aioredis
 from src.core.config import settings
 
+
+def _async_database_url(url: str) -> str:
+    """Map the sync DSN onto the asyncpg driver"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
 # Database engine
 engine = create_engine(settings.database_url, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async database engine (used by the API routers)
+async_engine = create_async_engine(_async_database_url(settings.database_url), pool_pre_ping=True)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
-# Redis client
+# Redis clients
 redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+async_redis_client = aioredis.from_url(settings.redis_url, decode_responses=True)
 
 
 def get_db():
@@ -23,7 +44,41 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting an async DB session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
-    """Initialize database tables"""
+    """
+    Initialize database tables, and nullable columns and indexes added to tables that already exist
+    
+    A newly created user_balances table is filled from the credit ledger.
+    """
+    if engine.dialect.name == "postgresql":
+        # Trigram indexes (catalog search) need pg_trgm
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    balances_existed = inspect(engine).has_table("user_balances")
     Base.metadata.create_all(bind=engine)
-
+    if not balances_existed:
+        # Materialized balances start from the ledger, not from zero
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO user_balances (user_id, balance, updated_at) "
+                "SELECT l.user_id, SUM(l.amount), CURRENT_TIMESTAMP FROM credit_ledger l "
+                "WHERE NOT EXISTS (SELECT 1 FROM user_balances b WHERE b.user_id = l.user_id) "
+                "GROUP BY l.user_id"
+            ))
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
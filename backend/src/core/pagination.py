@@ -0,0 +1,76 @@
+"""Keyset (cursor) pagination on (created_at, id)
+
+A cursor is an opaque, URL-safe token naming the last row of the previous
+page. Pages are fetched with a row-value comparison against it, so page N
+costs the same index range scan as page 1 and concurrent inserts never shift
+rows between pages. List endpoints return the cursor for the next page in
+the X-Next-Cursor header, which keeps their JSON bodies unchanged.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor; raises HTTPException(400) if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(
+    stmt: Select,
+    model,
+    limit: Optional[int],
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = True
+) -> Select:
+    """
+    Order a query by (created_at, id) and apply a cursor, or skip for offset paging
+
+    The cursor takes precedence over skip, which is kept for older clients.
+    """
+    if descending:
+        stmt = stmt.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        stmt = stmt.order_by(model.created_at, model.id)
+
+    if cursor:
+        key = tuple_(model.created_at, model.id)
+        after = tuple_(*decode_cursor(cursor))
+        stmt = stmt.where(key < after if descending else key > after)
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
+
+
+def next_cursor(rows: Sequence, limit: Optional[int]) -> Optional[str]:
+    """Cursor for the page after `rows`, or None if this was the last page"""
+    if not rows or limit is None or len(rows) < limit:
+        return None
+    last = rows[-1]
+    if isinstance(last, dict):
+        return encode_cursor(last["created_at"], last["id"])
+    return encode_cursor(last.created_at, last.id)
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: Optional[int]) -> None:
+    cursor = next_cursor(rows, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,138 @@
+"""Two-tier principal cache used by get_current_user
+
+Tier 1 is an in-process LRU of verified token hashes, valid until the token's
+``exp`` claim. Tier 2 is a Redis snapshot of the User row keyed by email, so a
+warm request resolves its principal without touching Postgres.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+import redis
+
+from src.core.config import settings
+from src.core.database import async_redis_client
+from src.models import User, UserRole
+
+
+USER_SNAPSHOT_KEY = "principal:user:{email}"
+SNAPSHOT_DATETIME_FIELDS = ("start_date", "created_at", "updated_at")
+
+
+class TokenCache:
+    """Thread-safe LRU mapping token hashes to (email, exp)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        """Return the cached email for a token, or None if missing/expired"""
+        key = self._hash(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            email, exp = entry
+            if exp <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return email
+
+    def set(self, token: str, email: str, exp: float) -> None:
+        """Remember a verified token until its expiry"""
+        key = self._hash(token)
+        with self._lock:
+            self._entries[key] = (email, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.principal_cache_size)
+
+
+def _snapshot_key(email: str) -> str:
+    return USER_SNAPSHOT_KEY.format(email=email)
+
+
+async def load_user_snapshot(email: str) -> Optional[User]:
+    """
+    Build a detached User from its Redis snapshot (no SQL)
+
+    A snapshot that cannot be decoded (stale format, corrupt value) is
+    dropped and treated as a miss, so the caller falls back to Postgres.
+    """
+    try:
+        raw = await async_redis_client.get(_snapshot_key(email))
+    except redis.RedisError:
+        return None
+    if not raw:
+        return None
+
+    try:
+        data = json.loads(raw)
+        for field in SNAPSHOT_DATETIME_FIELDS:
+            if data.get(field):
+                data[field] = datetime.fromisoformat(data[field])
+        data["role"] = UserRole(data["role"])
+        return User(**data)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        await invalidate_user(email)
+        return None
+
+
+async def store_user_snapshot(user: User) -> None:
+    """Cache a User row in Redis for the configured TTL"""
+    data = {
+        "id": user.id,
+        "email": user.email,
+        "name": user.name,
+        "role": user.role.value if user.role else UserRole.EMPLOYEE.value,
+        "is_active": user.is_active,
+    }
+    for field in SNAPSHOT_DATETIME_FIELDS:
+        value = getattr(user, field)
+        data[field] = value.isoformat() if value else None
+
+    try:
+        await async_redis_client.set(
+            _snapshot_key(user.email),
+            json.dumps(data),
+            ex=settings.principal_cache_ttl_seconds
+        )
+    except redis.RedisError:
+        pass
+
+
+async def invalidate_user(email: str) -> None:
+    """Drop a user's snapshot, e.g. after deactivation or a role change"""
+    try:
+        await async_redis_client.delete(_snapshot_key(email))
+    except redis.RedisError:
+        pass
+
+
+async def invalidate_users(emails: Iterable[str]) -> None:
+    """Drop several users' snapshots in one round-trip"""
+    keys = [_snapshot_key(email) for email in emails]
+    if not keys:
+        return
+    try:
+        await async_redis_client.delete(*keys)
+    except redis.RedisError:
+        pass
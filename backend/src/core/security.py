@@ -5,10 +5,12 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import settings
-from src.core.database import get_db
+from src.core.database import get_async_db
+from src.core.principal_cache import token_cache, load_user_snapshot, store_user_snapshot
 from src.models import User, UserRole
 
 
@@ -28,6 +30,40 @@ def verify_token(token: str) -> Optional[str]:
         return None
 
 
+def resolve_token_email(token: str) -> Optional[str]:
+    """Verify JWT token and return email, using the in-process token cache"""
+    email = token_cache.get(token)
+    if email is not None:
+        return email
+    
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+    
+    email = payload.get("sub")
+    if email is None:
+        return None
+    
+    exp = payload.get("exp")
+    if exp is not None:
+        token_cache.set(token, email, float(exp))
+    return email
+
+
+async def load_principal(db: AsyncSession, email: str) -> Optional[User]:
+    """Resolve a user by email from the Redis snapshot, falling back to the DB"""
+    user = await load_user_snapshot(email)
+    if user is not None:
+        return user
+    
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
+    if user is not None:
+        await store_user_snapshot(user)
+    return user
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -40,7 +76,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,11 +90,11 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if not token:
         raise credentials_exception
     
-    email = verify_token(token)
+    email = resolve_token_email(token)
     if email is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await load_principal(db, email)
     if user is None:
         raise credentials_exception
     
@@ -65,19 +104,19 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     return user
 
 
-def get_current_user_optional(
+async def get_current_user_optional(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Optional[User]:
     """Get current user if authenticated, None otherwise"""
     if not token:
         return None
     
-    email = verify_token(token)
+    email = resolve_token_email(token)
     if email is None:
         return None
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await load_principal(db, email)
     if user is None or not user.is_active:
         return None
     
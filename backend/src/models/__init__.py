@@ -1,15 +1,17 @@
 """Database models"""
 from .models import (
     User, UserRole,
-    Product, ProductVariant, InventoryLot,
+    Product, ProductVariant, InventoryLot, PRODUCT_SEARCH_DOCUMENT, SEARCH_CONFIG,
+    LISTED_PRODUCT, LIVE_VARIANT,
     Order, OrderItem, OrderStatus,
-    CreditLedger, CreditType
+    CreditLedger, CreditType, CreditAllocation, UserBalance
 )
 
 __all__ = [
     "User", "UserRole",
-    "Product", "ProductVariant", "InventoryLot",
+    "Product", "ProductVariant", "InventoryLot", "PRODUCT_SEARCH_DOCUMENT", "SEARCH_CONFIG",
+    "LISTED_PRODUCT", "LIVE_VARIANT",
     "Order", "OrderItem", "OrderStatus",
-    "CreditLedger", "CreditType"
+    "CreditLedger", "CreditType", "CreditAllocation", "UserBalance"
 ]
 
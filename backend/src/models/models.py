@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, Enum as SQLEnum
+from sqlalchemy import (
+    Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, UniqueConstraint,
+    Index, Enum as SQLEnum, and_
+)
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from src.core.database import Base
 import enum
 from datetime import datetime
@@ -28,6 +31,10 @@ class OrderStatus(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -45,6 +52,17 @@ class User(Base):
 
 class CreditLedger(Base):
     __tablename__ = "credit_ledger"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id)
+        Index("ix_credit_ledger_user_created_at_id", "user_id", "created_at", "id"),
+        # Date-range exports across all users
+        Index("ix_credit_ledger_created_at_id", "created_at", "id"),
+        # Ledger rows of purged orders
+        Index(
+            "ix_credit_ledger_reference_order_id", "reference_order_id",
+            postgresql_where=text("reference_order_id IS NOT NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -58,8 +76,33 @@ class CreditLedger(Base):
     user = relationship("User", back_populates="credit_ledger")
 
 
+class CreditAllocation(Base):
+    __tablename__ = "credit_allocations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "year", name="uq_credit_allocations_user_year"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    year = Column(Integer, nullable=False)
+    amount = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+
+class UserBalance(Base):
+    __tablename__ = "user_balances"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    balance = Column(Float, nullable=False, default=0.0)  # Running SUM(credit_ledger.amount)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id)
+        Index("ix_products_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -69,13 +112,43 @@ class Product(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    deleted_at = Column(DateTime, nullable=True)  # Soft-deleted; removed later by the purge job
     
     # Relationships
     variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
 
 
+# Catalog queries must filter with this exact predicate so Postgres can use the
+# partial indexes on listed products; soft-deleted rows stay out of them
+LISTED_PRODUCT = and_(Product.is_active == True, Product.deleted_at.is_(None))
+
+Index("ix_products_listed_created_at_id", Product.created_at, Product.id, postgresql_where=LISTED_PRODUCT)
+Index("ix_products_deleted_at", Product.deleted_at, postgresql_where=Product.deleted_at.isnot(None))
+
+
+# Full-text document for catalog search; queries must use this exact expression
+# so Postgres can answer them from the GIN index below
+SEARCH_CONFIG = text("'english'::regconfig")
+PRODUCT_SEARCH_DOCUMENT = func.to_tsvector(
+    SEARCH_CONFIG,
+    func.coalesce(Product.name, text("''"))
+    .op("||")(text("' '"))
+    .op("||")(func.coalesce(Product.description, text("''")))
+)
+
+Index("ix_products_search", PRODUCT_SEARCH_DOCUMENT, postgresql_using="gin").ddl_if(dialect="postgresql")
+Index(
+    "ix_products_name_trgm", Product.name,
+    postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+).ddl_if(dialect="postgresql")
+
+
 class ProductVariant(Base):
     __tablename__ = "product_variants"
+    __table_args__ = (
+        # Variant filters of catalog search, probed per product
+        Index("ix_product_variants_search", "product_id", "size", "color", "credits_modifier"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -83,14 +156,32 @@ class ProductVariant(Base):
     color = Column(String)  # Black, White, Red, etc.
     credits_modifier = Column(Float, default=0.0)  # Additional credits for this variant
     created_at = Column(DateTime, default=func.now())
+    deleted_at = Column(DateTime, nullable=True)  # Soft-deleted; removed later by the purge job
     
     # Relationships
     product = relationship("Product", back_populates="variants")
     inventory_lots = relationship("InventoryLot", back_populates="variant", cascade="all, delete-orphan")
 
 
+# Variant counterpart of LISTED_PRODUCT
+LIVE_VARIANT = ProductVariant.deleted_at.is_(None)
+
+Index(
+    "ix_product_variants_live_product_id", ProductVariant.product_id, ProductVariant.id,
+    postgresql_where=LIVE_VARIANT
+)
+Index(
+    "ix_product_variants_deleted_at", ProductVariant.deleted_at,
+    postgresql_where=ProductVariant.deleted_at.isnot(None)
+)
+
+
 class InventoryLot(Base):
     __tablename__ = "inventory_lots"
+    __table_args__ = (
+        # Covers the per-variant stock aggregates (index-only scans)
+        Index("ix_inventory_lots_variant_stock", "variant_id", "quantity", "reserved_quantity"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     variant_id = Column(Integer, ForeignKey("product_variants.id"), nullable=False)
@@ -105,6 +196,11 @@ class InventoryLot(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_user_created_at_id", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -121,6 +217,11 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        # Anti-join probes of the purge job (empty orders, unreferenced variants)
+        Index("ix_order_items_order_id", "order_id"),
+        Index("ix_order_items_variant_id", "variant_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
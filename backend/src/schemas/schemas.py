@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from src.models import UserRole, CreditType, OrderStatus
 
@@ -16,6 +16,12 @@ class UserCreate(UserBase):
     pass
 
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    role: Optional[UserRole] = None
+    is_active: Optional[bool] = None
+
+
 class UserResponse(UserBase):
     id: int
     is_active: bool
@@ -147,7 +153,7 @@ class InventoryLotResponse(InventoryLotBase):
 
 # Product with variants and inventory
 class ProductWithInventory(ProductResponse):
-    variants: List[VariantResponse]
+    variants: List[VariantWithInventory]
     
     class Config:
         from_attributes = True
@@ -260,9 +266,28 @@ class BulkCreditGrant(BaseModel):
     description: str
 
 
+class BatchOrderAction(BaseModel):
+    order_ids: List[int]
+    reason: Optional[str] = None  # deny only
+
+
 class UserImport(BaseModel):
     email: EmailStr
     name: str
     start_date: datetime
     role: UserRole
 
+
+# Direct-to-storage image upload schemas
+class ImageUploadRequest(BaseModel):
+    content_type: str
+    size: int
+    sha256: str
+
+
+class ImageUploadResponse(BaseModel):
+    image_url: str
+    upload_url: Optional[str] = None  # None when the same image is already stored
+    method: str = "PUT"
+    headers: Dict[str, str] = {}
+    expires_in: int = 0
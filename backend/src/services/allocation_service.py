@@ -0,0 +1,220 @@
+"""Annual capycoin allocation service"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import CreditAllocation, CreditLedger, CreditType, User, UserRole
+from src.services.credit_service import add_ledger_entries
+
+
+# Yearly capycoins per role (also used for the first-login grant)
+ANNUAL_CREDITS_BY_ROLE = {
+    UserRole.INTERN: 100.0,
+    UserRole.EMPLOYEE: 200.0,
+    UserRole.SENIOR: 300.0,
+    UserRole.ADMIN: 1000.0
+}
+DEFAULT_ANNUAL_CREDITS = 100.0
+
+ALLOCATION_CHUNK_SIZE = 500
+# Ledger descriptions of first-login and import grants start with this
+INITIAL_GRANT_PREFIX = "Initial credits"
+
+
+def get_annual_credits(role: UserRole) -> float:
+    """Get the full-year allocation for a role"""
+    return ANNUAL_CREDITS_BY_ROLE.get(role, DEFAULT_ANNUAL_CREDITS)
+
+
+def prorate_allocation(role: UserRole, start_date: datetime, year: int) -> float:
+    """
+    Prorate a role's yearly allocation by the part of the year after start_date
+    
+    Users who started before the year get the full amount; users starting after
+    it get nothing.
+    """
+    year_start = datetime(year, 1, 1)
+    year_end = datetime(year + 1, 1, 1)
+    if start_date is None or start_date <= year_start:
+        fraction = 1.0
+    elif start_date >= year_end:
+        fraction = 0.0
+    else:
+        fraction = (year_end - start_date).days / (year_end - year_start).days
+    return round(get_annual_credits(role) * fraction, 2)
+
+
+def allocation_description(year: int) -> str:
+    return f"Annual capycoins {year}"
+
+
+async def write_allocations(
+    db: AsyncSession,
+    year: int,
+    amounts: dict,
+    description: Optional[str] = None
+) -> dict:
+    """
+    Claim, ledger and balance a batch of allocations inside the caller's transaction
+    
+    Args:
+        db: Database session
+        year: Allocation year
+        amounts: Mapping of user_id to amount
+        description: Ledger description (defaults to the annual one)
+    
+    Returns:
+        Mapping of user_id to amount for the users actually granted
+    """
+    # Claim first: the unique (user_id, year) constraint keeps concurrent runs idempotent
+    claim = pg_insert(CreditAllocation).values([
+        {"user_id": user_id, "year": year, "amount": amount}
+        for user_id, amount in amounts.items()
+    ]).on_conflict_do_nothing(
+        index_elements=[CreditAllocation.user_id, CreditAllocation.year]
+    ).returning(CreditAllocation.user_id)
+    result = await db.execute(claim)
+    claimed = {user_id: amounts[user_id] for user_id in result.scalars().all()}
+    
+    description = description or allocation_description(year)
+    await add_ledger_entries(db, [
+        {
+            "user_id": user_id,
+            "amount": amount,
+            "credit_type": CreditType.GRANT,
+            "description": description,
+            "reference_order_id": None
+        }
+        for user_id, amount in claimed.items()
+    ])
+    return claimed
+
+
+def initial_grant_users(year: int):
+    """Users whose first-login or import grant is dated in the year"""
+    return select(CreditLedger.user_id).where(
+        CreditLedger.credit_type == CreditType.GRANT,
+        CreditLedger.description.like(f"{INITIAL_GRANT_PREFIX}%"),
+        CreditLedger.created_at >= datetime(year, 1, 1),
+        CreditLedger.created_at < datetime(year + 1, 1, 1)
+    )
+
+
+async def backfill_initial_allocations(db: AsyncSession, year: int) -> None:
+    """
+    Record initial grants made before allocations were tracked as the year's allocation
+    
+    Without this, users granted at first login before the allocation table
+    existed would receive the year a second time.
+    """
+    initial = initial_grant_users(year).add_columns(
+        literal(year), func.sum(CreditLedger.amount)
+    ).group_by(CreditLedger.user_id)
+    await db.execute(
+        pg_insert(CreditAllocation).from_select(
+            ["user_id", "year", "amount"], initial
+        ).on_conflict_do_nothing(
+            index_elements=[CreditAllocation.user_id, CreditAllocation.year]
+        )
+    )
+    await db.commit()
+
+
+async def run_annual_allocation(
+    db: AsyncSession,
+    year: int,
+    chunk_size: int = ALLOCATION_CHUNK_SIZE,
+    dry_run: bool = False
+) -> dict:
+    """
+    Grant every active user their (prorated) allocation for a year
+    
+    Users are walked in id order in chunks; each chunk is committed on its
+    own. Users who already have an allocation for the year are skipped, so the
+    job is idempotent and simply resumes where it stopped after a crash.
+    
+    Args:
+        db: Database session
+        year: Allocation year
+        chunk_size: Users written per transaction
+        dry_run: Compute the allocation without writing anything
+    
+    Returns:
+        Summary of the run
+    """
+    year_end = datetime(year + 1, 1, 1)
+    if not dry_run:
+        await backfill_initial_allocations(db, year)
+    already_allocated = select(CreditAllocation.user_id).where(
+        CreditAllocation.year == year
+    ).union(initial_grant_users(year))
+    previously_allocated = await db.scalar(
+        select(func.count(CreditAllocation.id)).where(CreditAllocation.year == year)
+    )
+    
+    allocated_count = 0
+    allocated_credits = 0.0
+    chunks = 0
+    last_id = 0
+    
+    while True:
+        result = await db.execute(
+            select(User.id, User.role, User.start_date).where(
+                User.is_active == True,
+                User.start_date < year_end,
+                User.id > last_id,
+                User.id.not_in(already_allocated)
+            ).order_by(User.id).limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+    
+        amounts = {
+            row.id: prorate_allocation(row.role, row.start_date, year)
+            for row in rows
+        }
+        amounts = {user_id: amount for user_id, amount in amounts.items() if amount > 0}
+        if not amounts:
+            continue
+    
+        if dry_run:
+            claimed = amounts
+        else:
+            claimed = await write_allocations(db, year, amounts)
+            await db.commit()
+    
+        allocated_count += len(claimed)
+        allocated_credits += sum(claimed.values())
+        chunks += 1
+    
+    return {
+        "year": year,
+        "dry_run": dry_run,
+        "previously_allocated_count": previously_allocated,
+        "allocated_count": allocated_count,
+        "allocated_credits": round(allocated_credits, 2),
+        "chunks": chunks
+    }
+
+
+async def grant_initial_allocation(db: AsyncSession, user: User, year: Optional[int] = None) -> float:
+    """
+    Grant a new user's first credits (the role's full amount) as this year's allocation
+    
+    Accounts created at login only carry their creation time as start_date, so
+    nothing is prorated here; imports, which know the real start date, prorate
+    themselves. Claiming the allocation keeps the annual job from granting the
+    same year twice. Returns the amount granted (0 if the year was already allocated).
+    """
+    year = year or datetime.utcnow().year
+    amount = get_annual_credits(user.role)
+    claimed = await write_allocations(
+        db, year, {user.id: amount}, f"Initial credits for {user.role.value}"
+    )
+    await db.commit()
+    return claimed.get(user.id, 0.0)
@@ -0,0 +1,139 @@
+"""Versioned read-through cache for catalog responses
+
+Serialized product responses are stored in Redis under the current catalog
+version. Admin mutations bump the version instead of deleting keys, so stale
+entries are simply never read again and expire on their own. Every response
+carries a strong ETag (a hash of its body); a matching If-None-Match is
+answered with 304 from Redis alone.
+"""
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import redis
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from src.core.config import settings
+from src.core.database import async_redis_client
+
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_CACHE_CONTROL = "no-cache"
+
+
+def serialize(response_type: Any, value: Any) -> bytes:
+    """Validate ORM objects against a response schema and dump them to JSON"""
+    adapter = TypeAdapter(response_type)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, per RFC 9110) against one ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+async def get_catalog_version() -> Optional[int]:
+    """Current catalog version, or None if Redis is unavailable"""
+    try:
+        return int(await async_redis_client.get(CATALOG_VERSION_KEY) or 0)
+    except redis.RedisError:
+        return None
+
+
+async def bump_catalog_version() -> None:
+    """Invalidate every cached catalog response (call after committing a mutation)"""
+    try:
+        await async_redis_client.incr(CATALOG_VERSION_KEY)
+    except redis.RedisError:
+        pass
+
+
+def product_detail_key(product_id: int) -> str:
+    return f"products:detail:{product_id}"
+
+
+async def invalidate_product_details(product_ids: Iterable[int]) -> None:
+    """Drop cached product details whose availability changed (orders, not admin edits)"""
+    product_ids = set(product_ids)
+    version = await get_catalog_version()
+    if version is None or not product_ids:
+        return
+    try:
+        await async_redis_client.delete(*[
+            f"catalog:v{version}:{product_detail_key(product_id)}" for product_id in product_ids
+        ])
+    except redis.RedisError:
+        pass
+
+
+def _json_response(body: bytes, etag: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**(headers or {}), "ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    )
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    )
+
+
+async def cached_response(
+    key: str,
+    build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]],
+    if_none_match: Optional[str] = None,
+    ttl: Optional[int] = None
+) -> Response:
+    """
+    Serve a catalog response from Redis, building and storing it on a miss
+
+    Args:
+        key: Cache key for this response, unique per path and query
+        build: Coroutine producing the serialized body and any extra response
+            headers, such as the next page cursor (may raise HTTPException)
+        if_none_match: The request's If-None-Match header
+        ttl: Entry lifetime in seconds (defaults to CATALOG_CACHE_TTL_SECONDS)
+    """
+    version = await get_catalog_version()
+    entry_key = f"catalog:v{version}:{key}"
+
+    if version is not None:
+        try:
+            etag, body, headers = await async_redis_client.hmget(entry_key, "etag", "body", "headers")
+        except redis.RedisError:
+            etag, body, headers = None, None, None
+        if etag and etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        if etag and body is not None:
+            return _json_response(body.encode(), etag, json.loads(headers or "{}"))
+
+    body, headers = await build()
+    etag = make_etag(body)
+
+    if version is not None:
+        try:
+            async with async_redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(entry_key, mapping={
+                    "etag": etag, "body": body.decode(), "headers": json.dumps(headers)
+                })
+                pipe.expire(entry_key, ttl or settings.catalog_cache_ttl_seconds)
+                await pipe.execute()
+        except redis.RedisError:
+            pass
+
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    return _json_response(body, etag, headers)
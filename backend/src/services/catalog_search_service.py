@@ -0,0 +1,74 @@
+"""Catalog search service"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import Select, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import LISTED_PRODUCT, LIVE_VARIANT, PRODUCT_SEARCH_DOCUMENT, SEARCH_CONFIG, Product, ProductVariant
+
+
+SEARCH_RESULT_LIMIT = 50
+
+
+def _prefix_tsquery(q: str) -> Optional[str]:
+    """Turn free text into a prefix tsquery ("blue hood" -> "blue:* & hood:*")"""
+    terms = re.findall(r"\w+", q.lower())
+    return " & ".join(f"{term}:*" for term in terms) or None
+
+
+def _like_prefix(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
+def build_search_query(
+    q: Optional[str] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_credits: Optional[float] = None,
+    max_credits: Optional[float] = None,
+    skip: int = 0,
+    limit: int = SEARCH_RESULT_LIMIT
+) -> Select:
+    """
+    Build the catalog search query
+    
+    Text matches the full-text document (GIN ix_products_search) or a name
+    prefix (trigram GIN ix_products_name_trgm); Postgres ORs the two bitmap
+    scans. Variant filters are an EXISTS probe on ix_product_variants_search.
+    Results are ranked by text relevance, then by id.
+    """
+    stmt = select(Product).where(LISTED_PRODUCT)
+    ranking = []
+    
+    q = (q or "").strip()
+    if q:
+        matches = [Product.name.ilike(_like_prefix(q), escape="\\")]
+        tsquery_text = _prefix_tsquery(q)
+        if tsquery_text:
+            tsquery = func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+            matches.append(PRODUCT_SEARCH_DOCUMENT.op("@@")(tsquery))
+            ranking.append(func.ts_rank(PRODUCT_SEARCH_DOCUMENT, tsquery).desc())
+        stmt = stmt.where(or_(*matches))
+    
+    if size or color or min_credits is not None or max_credits is not None:
+        variant_match = select(ProductVariant.id).where(ProductVariant.product_id == Product.id, LIVE_VARIANT)
+        if size:
+            variant_match = variant_match.where(ProductVariant.size == size)
+        if color:
+            variant_match = variant_match.where(ProductVariant.color == color)
+        effective_credits = Product.base_credits + func.coalesce(ProductVariant.credits_modifier, 0.0)
+        if min_credits is not None:
+            variant_match = variant_match.where(effective_credits >= min_credits)
+        if max_credits is not None:
+            variant_match = variant_match.where(effective_credits <= max_credits)
+        stmt = stmt.where(variant_match.exists())
+    
+    return stmt.order_by(*ranking, Product.id).offset(skip).limit(limit)
+
+
+async def search_products(db: AsyncSession, **filters) -> List[Product]:
+    """Search active products; see build_search_query for the filters"""
+    result = await db.execute(build_search_query(**filters))
+    return list(result.scalars().all())
@@ -0,0 +1,159 @@
+"""Precomputed full-catalog snapshot
+
+The whole active catalog (products, variants and available stock) is
+rendered once into JSON bytes, plus gzip and, when the brotli package is
+installed, brotli encodings. Each worker keeps its snapshot in memory, tagged
+with the catalog version it was built from; requests only compare versions and
+return the stored bytes. Admin mutations bump the version and mark the
+snapshot stale; a background task rebuilds it shortly afterwards (or the next
+read does, if that comes first), so a burst of edits shares one rebuild. Stock also moves
+with orders, so a snapshot is additionally rebuilt once it is older than
+CATALOG_SNAPSHOT_MAX_AGE_SECONDS.
+"""
+import asyncio
+import gzip
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Response
+from sqlalchemy import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.models import LISTED_PRODUCT, Product
+from src.schemas.schemas import ProductResponse, ProductWithInventory
+from src.services.catalog_cache_service import (
+    CATALOG_CACHE_CONTROL, bump_catalog_version, etag_matches, get_catalog_version, make_etag, serialize
+)
+from src.services.inventory_service import get_active_variants_with_availability
+
+try:
+    import brotli
+except ImportError:  # optional: snapshots are then served as gzip or identity
+    brotli = None
+
+# Changes published within this window share one background rebuild
+REBUILD_DELAY_SECONDS = 1.0
+
+
+class CatalogSnapshot:
+    """Pre-serialized catalog bytes, by content encoding"""
+
+    def __init__(self, version: Optional[int], changes: int, body: bytes):
+        self.version = version
+        # This worker's change count when the build started (see publish_catalog_change)
+        self.changes = changes
+        self.built_at = time.monotonic()
+        self.etag = make_etag(body)
+        self.encodings: Dict[str, bytes] = {"identity": body}
+        self.encodings["gzip"] = gzip.compress(body, compresslevel=9)
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(body)
+
+    def is_current(self, version: Optional[int]) -> bool:
+        if self.changes != _changes or (version is not None and version != self.version):
+            return False
+        return time.monotonic() - self.built_at < settings.catalog_snapshot_max_age_seconds
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_changes = 0
+_rebuild_lock = asyncio.Lock()
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def build_snapshot(version: Optional[int]) -> CatalogSnapshot:
+    """Render the active catalog (two queries) into a new snapshot"""
+    changes = _changes
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Product).where(LISTED_PRODUCT).order_by(Product.id)
+        )
+        products = result.scalars().all()
+        variants = await get_active_variants_with_availability(db)
+
+    catalog = [
+        ProductWithInventory(
+            **ProductResponse.model_validate(product).model_dump(),
+            variants=variants.get(product.id, [])
+        )
+        for product in products
+    ]
+    return CatalogSnapshot(version, changes, serialize(List[ProductWithInventory], catalog))
+
+
+async def get_snapshot() -> CatalogSnapshot:
+    """Return this worker's snapshot, rebuilding it if the catalog moved on"""
+    global _snapshot
+    version = await get_catalog_version()
+    if _snapshot is not None and _snapshot.is_current(version):
+        return _snapshot
+
+    async with _rebuild_lock:
+        # Another request may have rebuilt it while we waited
+        if _snapshot is None or not _snapshot.is_current(version):
+            _snapshot = await build_snapshot(version)
+        return _snapshot
+
+
+async def _refresh_snapshot() -> None:
+    await asyncio.sleep(REBUILD_DELAY_SECONDS)
+    try:
+        await get_snapshot()
+    except Exception as e:
+        print(f"⚠️  Catalog snapshot rebuild failed: {e}")
+
+
+async def publish_catalog_change() -> None:
+    """
+    Invalidate cached catalog responses and schedule a snapshot rebuild
+
+    Call after committing an admin product, variant or inventory mutation.
+    The rebuild runs outside the request, REBUILD_DELAY_SECONDS later, and
+    covers every change made meanwhile. The bumped version makes the other
+    workers rebuild on their next read.
+    """
+    global _changes, _refresh_task
+    _changes += 1
+    await bump_catalog_version()
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_snapshot())
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> str:
+    """Pick br, then gzip, then identity according to Accept-Encoding"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    for coding in ("br", "gzip"):
+        if coding in available and (coding in accepted or "*" in accepted):
+            return coding
+    return "identity"
+
+
+def snapshot_response(
+    snapshot: CatalogSnapshot,
+    accept_encoding: Optional[str],
+    if_none_match: Optional[str]
+) -> Response:
+    """Serve snapshot bytes as-is, with a distinct strong ETag per encoding"""
+    coding = choose_encoding(accept_encoding, snapshot.encodings)
+    etag = snapshot.etag if coding == "identity" else f'{snapshot.etag[:-1]}-{coding}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(
+        content=snapshot.encodings[coding],
+        media_type="application/json",
+        headers=headers
+    )
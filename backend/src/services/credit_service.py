@@ -1,25 +1,59 @@
 """Credit management service"""
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from src.models import CreditLedger, CreditType
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import DateTime, cast, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models import CreditLedger, CreditType, User, UserBalance
 
 
-def get_user_balance(db: Session, user_id: int) -> float:
-    """Calculate user's current credit balance"""
-    result = db.query(func.sum(CreditLedger.amount)).filter(
-        CreditLedger.user_id == user_id
-    ).scalar()
-    return float(result or 0.0)
+BALANCE_DRIFT_TOLERANCE = 1e-6
 
+# Bulk grants at or above this size are written with COPY instead of INSERT
+BULK_COPY_THRESHOLD = 1000
 
-def grant_credits(
-    db: Session,
+
+async def get_user_balance(db: AsyncSession, user_id: int, for_update: bool = False) -> float:
+    """
+    Get user's current credit balance (primary-key lookup on user_balances)
+    
+    With for_update=True the user's balance row is locked until the caller's
+    transaction ends, serializing concurrent spends by the same user without
+    blocking anyone else.
+    """
+    stmt = select(UserBalance.balance).where(UserBalance.user_id == user_id)
+    if for_update:
+        stmt = stmt.with_for_update()
+    result = await db.execute(stmt)
+    return float(result.scalar() or 0.0)
+
+
+async def apply_balance_delta(db: AsyncSession, user_id: int, delta: float) -> None:
+    """Add delta to the user's materialized balance inside the caller's transaction"""
+    stmt = pg_insert(UserBalance).values(user_id=user_id, balance=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserBalance.user_id],
+        set_={
+            "balance": UserBalance.balance + stmt.excluded.balance,
+            "updated_at": func.now()
+        }
+    )
+    await db.execute(stmt)
+
+
+async def grant_credits(
+    db: AsyncSession,
     user_id: int,
     amount: float,
     description: str,
-    order_id: int = None
+    order_id: int = None,
+    commit: bool = True
 ) -> CreditLedger:
-    """Grant credits to a user"""
+    """
+    Grant credits to a user
+    
+    With commit=False the entry and balance update join the caller's
+    transaction (unit of work) and the caller is responsible for committing.
+    """
     ledger_entry = CreditLedger(
         user_id=user_id,
         amount=amount,
@@ -28,19 +62,27 @@ def grant_credits(
         reference_order_id=order_id
     )
     db.add(ledger_entry)
-    db.commit()
-    db.refresh(ledger_entry)
+    await apply_balance_delta(db, user_id, amount)
+    if commit:
+        await db.commit()
+        await db.refresh(ledger_entry)
     return ledger_entry
 
 
-def deduct_credits(
-    db: Session,
+async def deduct_credits(
+    db: AsyncSession,
     user_id: int,
     amount: float,
     description: str,
-    order_id: int
+    order_id: int,
+    commit: bool = True
 ) -> CreditLedger:
-    """Deduct credits from a user"""
+    """
+    Deduct credits from a user
+    
+    With commit=False the entry and balance update join the caller's
+    transaction (unit of work) and the caller is responsible for committing.
+    """
     ledger_entry = CreditLedger(
         user_id=user_id,
         amount=-amount,
@@ -49,7 +91,230 @@ def deduct_credits(
         reference_order_id=order_id
     )
     db.add(ledger_entry)
-    db.commit()
-    db.refresh(ledger_entry)
+    await apply_balance_delta(db, user_id, -amount)
+    if commit:
+        await db.commit()
+        await db.refresh(ledger_entry)
     return ledger_entry
 
+
+async def _copy_ledger_rows(db: AsyncSession, rows: List[dict]) -> List[int]:
+    """Write ledger rows with COPY, pre-allocating ids from the table's sequence"""
+    result = await db.execute(
+        select(func.nextval("credit_ledger_id_seq")).select_from(
+            func.generate_series(1, len(rows))
+        )
+    )
+    ids = list(result.scalars().all())
+    # The transaction's now(), cast like the column default, so COPY'd rows match inserted ones
+    now = await db.scalar(select(cast(func.now(), DateTime)))
+    records = [
+        (
+            ledger_id, row["user_id"], row["amount"], row["credit_type"].name,
+            row["description"], row["reference_order_id"], now
+        )
+        for ledger_id, row in zip(ids, rows)
+    ]
+    
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        CreditLedger.__tablename__,
+        records=records,
+        columns=[
+            "id", "user_id", "amount", "credit_type",
+            "description", "reference_order_id", "created_at"
+        ]
+    )
+    return ids
+
+
+async def add_ledger_entries(db: AsyncSession, rows: List[dict]) -> List[int]:
+    """
+    Write many ledger rows and their balance changes inside the caller's transaction
+    
+    Rows (user_id, amount, credit_type, description, reference_order_id) go
+    in one batch (COPY for large sets); balances get one upsert with the
+    amounts summed per user. Returns the ledger ids in row order.
+    """
+    if not rows:
+        return []
+    
+    if len(rows) >= BULK_COPY_THRESHOLD:
+        ledger_ids = await _copy_ledger_rows(db, rows)
+    else:
+        result = await db.execute(
+            insert(CreditLedger).returning(CreditLedger.id, sort_by_parameter_order=True),
+            rows
+        )
+        ledger_ids = list(result.scalars().all())
+    
+    deltas: Dict[int, float] = {}
+    for row in rows:
+        deltas[row["user_id"]] = deltas.get(row["user_id"], 0.0) + row["amount"]
+    stmt = pg_insert(UserBalance)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserBalance.user_id],
+        set_={
+            "balance": UserBalance.balance + stmt.excluded.balance,
+            "updated_at": func.now()
+        }
+    )
+    await db.execute(
+        stmt, [{"user_id": user_id, "balance": delta} for user_id, delta in sorted(deltas.items())]
+    )
+    return ledger_ids
+
+
+async def bulk_grant_credits(
+    db: AsyncSession,
+    user_ids: List[int],
+    amount: float,
+    description: str
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Grant the same amount to many users in one transaction
+    
+    Users are validated with a single query, ledger rows are written in one
+    batch (COPY for large sets) and balances with one upsert.
+    
+    Returns:
+        Tuple of (successful users, failed users) in request order
+    """
+    failed = []
+    unique_ids = []
+    seen = set()
+    for user_id in user_ids:
+        if user_id in seen:
+            failed.append({"user_id": user_id, "reason": "Duplicate user ID in request"})
+            continue
+        seen.add(user_id)
+        unique_ids.append(user_id)
+    
+    result = await db.execute(select(User.id, User.name).where(User.id.in_(unique_ids)))
+    names = dict(result.all())
+    
+    granted_ids = []
+    for user_id in unique_ids:
+        if user_id in names:
+            granted_ids.append(user_id)
+        else:
+            failed.append({"user_id": user_id, "reason": "User not found"})
+    
+    if not granted_ids:
+        return [], failed
+    
+    rows = [
+        {
+            "user_id": user_id,
+            "amount": amount,
+            "credit_type": CreditType.GRANT,
+            "description": description,
+            "reference_order_id": None
+        }
+        for user_id in granted_ids
+    ]
+    
+    try:
+        ledger_ids = await add_ledger_entries(db, rows)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        failed.extend({"user_id": user_id, "reason": str(e)} for user_id in granted_ids)
+        return [], failed
+    
+    successful = [
+        {"user_id": user_id, "user_name": names[user_id], "ledger_entry_id": ledger_id}
+        for user_id, ledger_id in zip(granted_ids, ledger_ids)
+    ]
+    return successful, failed
+
+
+async def delete_order_ledger_entries(db: AsyncSession, order_ids: Iterable[int]) -> None:
+    """Delete ledger entries referencing the given orders and back them out of balances"""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+    
+    result = await db.execute(
+        select(CreditLedger.user_id, func.sum(CreditLedger.amount)).where(
+            CreditLedger.reference_order_id.in_(order_ids)
+        ).group_by(CreditLedger.user_id)
+    )
+    for user_id, total in result.all():
+        await apply_balance_delta(db, user_id, -float(total or 0.0))
+    
+    await db.execute(
+        delete(CreditLedger).where(CreditLedger.reference_order_id.in_(order_ids)),
+        execution_options={"synchronize_session": False}
+    )
+
+
+async def reconcile_balances(db: AsyncSession, apply: bool = False) -> List[dict]:
+    """
+    Recompute every user's balance from the ledger and report drift
+    
+    Args:
+        db: Database session
+        apply: Overwrite drifted materialized balances with the ledger total
+    
+    Returns:
+        List of drifted users with their stored and ledger balances
+    """
+    ledger_totals = select(
+        CreditLedger.user_id,
+        func.sum(CreditLedger.amount).label("total")
+    ).group_by(CreditLedger.user_id).subquery()
+    
+    result = await db.execute(
+        select(User.id, ledger_totals.c.total, UserBalance.balance)
+        .outerjoin(ledger_totals, ledger_totals.c.user_id == User.id)
+        .outerjoin(UserBalance, UserBalance.user_id == User.id)
+        .order_by(User.id)
+    )
+    
+    drift = []
+    for user_id, ledger_total, stored in result.all():
+        ledger_balance = float(ledger_total or 0.0)
+        if stored is not None and abs(float(stored) - ledger_balance) <= BALANCE_DRIFT_TOLERANCE:
+            continue
+        if stored is None and ledger_total is None:
+            continue
+        drift.append({
+            "user_id": user_id,
+            "stored_balance": float(stored) if stored is not None else None,
+            "ledger_balance": ledger_balance
+        })
+    
+    if apply and drift:
+        user_ids = sorted(row["user_id"] for row in drift)
+        # Lock the drifted rows (creating missing ones) in user_id order, like
+        # add_ledger_entries, then recompute the totals under the lock: ledger
+        # writers update the balance in the same transaction, so none is lost
+        await db.execute(
+            pg_insert(UserBalance).values(
+                [{"user_id": user_id, "balance": 0.0} for user_id in user_ids]
+            ).on_conflict_do_nothing(index_elements=[UserBalance.user_id])
+        )
+        await db.execute(
+            select(UserBalance.user_id)
+            .where(UserBalance.user_id.in_(user_ids))
+            .order_by(UserBalance.user_id)
+            .with_for_update()
+        )
+        ledger_total = select(func.coalesce(func.sum(CreditLedger.amount), 0.0)).where(
+            CreditLedger.user_id == UserBalance.user_id
+        ).scalar_subquery()
+        result = await db.execute(
+            update(UserBalance)
+            .where(UserBalance.user_id.in_(user_ids))
+            .values(balance=ledger_total, updated_at=func.now())
+            .returning(UserBalance.user_id, UserBalance.balance),
+            execution_options={"synchronize_session": False}
+        )
+        applied = dict(result.all())
+        for row in drift:
+            row["ledger_balance"] = float(applied[row["user_id"]])
+        await db.commit()
+    
+    return drift
@@ -0,0 +1,162 @@
+"""Streaming exports of orders and the credit ledger (CSV / NDJSON)
+
+Exports read through a server-side cursor (yield_per) in their own session
+and are encoded one batch of EXPORT_BATCH_SIZE rows at a time, so memory
+stays flat however many rows match. The read is a plain SELECT: it takes no
+row locks and never blocks checkouts or fulfilment while it streams.
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from enum import Enum
+from typing import AsyncIterator, Iterable, List, Optional, Sequence
+
+import orjson
+from sqlalchemy import Select, select
+
+from src.core.database import AsyncSessionLocal
+from src.models import CreditLedger, Order, User
+from src.services.order_listing_service import group_order_rows, order_items_query, order_rows_query
+
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# One CSV row per order item; orders without items get a row with empty item columns
+ORDER_CSV_COLUMNS = [
+    ("order_id", "id"), ("status", "status"), ("order_total_credits", "total_credits"),
+    ("created_at", "created_at"), ("completed_at", "completed_at"),
+    ("user_id", "user_id"), ("user_email", "user_email"), ("user_name", "user_name"),
+    ("item_id", "item_id"), ("variant_id", "item_variant_id"), ("product_name", "product_name"),
+    ("variant_size", "variant_size"), ("variant_color", "variant_color"),
+    ("quantity", "item_quantity"), ("unit_credits", "item_unit_credits"),
+    ("item_total_credits", "item_total_credits")
+]
+LEDGER_CSV_COLUMNS = [
+    "id", "user_id", "user_email", "amount", "credit_type",
+    "description", "reference_order_id", "created_at"
+]
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # created_at columns are naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _check_export(fmt: str, start: Optional[datetime], end: Optional[datetime]) -> None:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format. Allowed: {', '.join(EXPORT_FORMATS)}")
+    if start and end and _naive_utc(start) >= _naive_utc(end):
+        raise ValueError("start must be before end")
+
+
+def _in_range(stmt: Select, column, start: Optional[datetime], end: Optional[datetime]) -> Select:
+    """Filter to start <= column < end"""
+    if start:
+        stmt = stmt.where(column >= _naive_utc(start))
+    if end:
+        stmt = stmt.where(column < _naive_utc(end))
+    return stmt
+
+
+def export_filename(name: str, fmt: str, start: Optional[datetime], end: Optional[datetime]) -> str:
+    """e.g. orders_2024-01-01_2024-02-01.csv"""
+    parts = [name]
+    if start or end:
+        parts += [start.date().isoformat() if start else "start", end.date().isoformat() if end else "now"]
+    return f"{'_'.join(parts)}.{fmt}"
+
+
+def _csv_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunk(rows: Iterable[Sequence]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _ndjson_chunk(records: Iterable) -> bytes:
+    return b"".join(orjson.dumps(record) + b"\n" for record in records)
+
+
+async def _partitions(stmt: Select) -> AsyncIterator[Sequence]:
+    """Yield the statement's rows in batches through a server-side cursor"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield rows
+
+
+def orders_export_query(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Select:
+    """Orders created in [start, end) with their user and items, oldest first"""
+    return order_items_query(_in_range(order_rows_query(), Order.created_at, start, end), descending=False)
+
+
+def ledger_export_query(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Select:
+    """Ledger entries created in [start, end) with the user's email, oldest first"""
+    stmt = select(
+        CreditLedger.id, CreditLedger.user_id, User.email.label("user_email"), CreditLedger.amount,
+        CreditLedger.credit_type, CreditLedger.description, CreditLedger.reference_order_id,
+        CreditLedger.created_at
+    ).outerjoin(User, User.id == CreditLedger.user_id)
+    return _in_range(stmt, CreditLedger.created_at, start, end).order_by(
+        CreditLedger.created_at, CreditLedger.id
+    )
+
+
+async def _order_chunks(fmt: str, stmt: Select) -> AsyncIterator[bytes]:
+    if fmt == "csv":
+        yield _csv_chunk([[header for header, _ in ORDER_CSV_COLUMNS]])
+        async for rows in _partitions(stmt):
+            yield _csv_chunk([getattr(row, column) for _, column in ORDER_CSV_COLUMNS] for row in rows)
+        return
+
+    orders: List[dict] = []
+    async for rows in _partitions(stmt):
+        group_order_rows(rows, orders)
+        # The last order's items may carry on into the next batch
+        finished, orders = orders[:-1], orders[-1:]
+        if finished:
+            yield _ndjson_chunk(finished)
+    if orders:
+        yield _ndjson_chunk(orders)
+
+
+async def _ledger_chunks(fmt: str, stmt: Select) -> AsyncIterator[bytes]:
+    if fmt == "csv":
+        yield _csv_chunk([LEDGER_CSV_COLUMNS])
+    async for rows in _partitions(stmt):
+        if fmt == "csv":
+            yield _csv_chunk(rows)
+        else:
+            yield _ndjson_chunk(row._asdict() for row in rows)
+
+
+def stream_orders_export(
+    fmt: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> AsyncIterator[bytes]:
+    """
+    Orders (NDJSON: one order with nested items per line; CSV: one row per item)
+    
+    Arguments are checked here, so a bad request raises ValueError before
+    the response starts.
+    """
+    _check_export(fmt, start, end)
+    return _order_chunks(fmt, orders_export_query(start, end))
+
+
+def stream_ledger_export(
+    fmt: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> AsyncIterator[bytes]:
+    """Credit ledger entries, one per line/row (raises ValueError on bad arguments)"""
+    _check_export(fmt, start, end)
+    return _ledger_chunks(fmt, ledger_export_query(start, end))
@@ -0,0 +1,178 @@
+"""Inventory availability queries"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.models import LISTED_PRODUCT, LIVE_VARIANT, InventoryLot, Product, ProductVariant
+
+
+def availability_subquery(product_id: Optional[int] = None):
+    """
+    Available stock per variant (quantity - reserved, summed over its lots)
+    
+    Pass product_id to aggregate only that product's lots.
+    """
+    stmt = select(
+        InventoryLot.variant_id,
+        func.sum(InventoryLot.quantity - InventoryLot.reserved_quantity).label("available_quantity")
+    ).group_by(InventoryLot.variant_id)
+    if product_id is not None:
+        stmt = stmt.join(
+            ProductVariant, ProductVariant.id == InventoryLot.variant_id
+        ).where(ProductVariant.product_id == product_id)
+    return stmt.subquery()
+
+
+def stock_subquery():
+    """Total and reserved stock per variant, summed over its lots"""
+    return select(
+        InventoryLot.variant_id,
+        func.sum(InventoryLot.quantity).label("total_stock"),
+        func.sum(InventoryLot.reserved_quantity).label("reserved")
+    ).group_by(InventoryLot.variant_id).subquery()
+
+
+def _stock_status(available: int) -> str:
+    if available == 0:
+        return "out_of_stock"
+    return "low_stock" if available < settings.low_stock_threshold else "in_stock"
+
+
+def _variant_row(variant: ProductVariant, available) -> dict:
+    return {
+        "id": variant.id,
+        "product_id": variant.product_id,
+        "size": variant.size,
+        "color": variant.color,
+        "credits_modifier": variant.credits_modifier,
+        "created_at": variant.created_at,
+        "available_quantity": int(available)
+    }
+
+
+async def get_variants_with_availability(db: AsyncSession, product_id: int) -> List[dict]:
+    """Load a product's variants with their available quantity in a single query"""
+    availability = availability_subquery(product_id)
+    result = await db.execute(
+        select(
+            ProductVariant,
+            func.coalesce(availability.c.available_quantity, 0)
+        )
+        .outerjoin(availability, availability.c.variant_id == ProductVariant.id)
+        .where(ProductVariant.product_id == product_id, LIVE_VARIANT)
+        .order_by(ProductVariant.id)
+    )
+    return [_variant_row(variant, available) for variant, available in result.all()]
+
+
+async def get_active_variants_with_availability(db: AsyncSession) -> Dict[int, List[dict]]:
+    """Variants of every active product with availability, grouped by product id (one query)"""
+    availability = availability_subquery()
+    result = await db.execute(
+        select(
+            ProductVariant,
+            func.coalesce(availability.c.available_quantity, 0)
+        )
+        .join(Product, Product.id == ProductVariant.product_id)
+        .outerjoin(availability, availability.c.variant_id == ProductVariant.id)
+        .where(LISTED_PRODUCT, LIVE_VARIANT)
+        .order_by(ProductVariant.product_id, ProductVariant.id)
+    )
+    variants: Dict[int, List[dict]] = {}
+    for variant, available in result.all():
+        variants.setdefault(variant.product_id, []).append(_variant_row(variant, available))
+    return variants
+
+
+async def get_stock_overview(db: AsyncSession) -> List[dict]:
+    """
+    Stock per variant and per product for every active product (one query)
+    
+    Lots are summed in SQL; rows come back one per variant (or one per
+    product without variants) and are only grouped here.
+    """
+    stock = stock_subquery()
+    total_stock = func.coalesce(stock.c.total_stock, 0)
+    reserved = func.coalesce(stock.c.reserved, 0)
+    result = await db.execute(
+        select(
+            Product.id, Product.name, Product.description, Product.base_credits, Product.image_url,
+            ProductVariant.id, ProductVariant.size, ProductVariant.color, ProductVariant.credits_modifier,
+            total_stock, reserved
+        )
+        .outerjoin(ProductVariant, and_(ProductVariant.product_id == Product.id, LIVE_VARIANT))
+        .outerjoin(stock, stock.c.variant_id == ProductVariant.id)
+        .where(LISTED_PRODUCT)
+        .order_by(Product.id, ProductVariant.id)
+    )
+    
+    overview: List[dict] = []
+    for (product_id, name, description, base_credits, image_url,
+         variant_id, size, color, credits_modifier, variant_stock, variant_reserved) in result.all():
+        if not overview or overview[-1]["id"] != product_id:
+            overview.append({
+                "id": product_id,
+                "name": name,
+                "description": description,
+                "base_credits": base_credits,
+                "image_url": image_url,
+                "total_variants": 0,
+                "variants": [],
+                "total_stock": 0,
+                "total_reserved": 0,
+                "total_available": 0
+            })
+        if variant_id is None:
+            continue
+        
+        product = overview[-1]
+        available = int(variant_stock) - int(variant_reserved)
+        product["variants"].append({
+            "id": variant_id,
+            "size": size,
+            "color": color,
+            "credits_modifier": credits_modifier,
+            "total_stock": int(variant_stock),
+            "reserved": int(variant_reserved),
+            "available": available,
+            "stock_status": _stock_status(available)
+        })
+        product["total_variants"] += 1
+        product["total_stock"] += int(variant_stock)
+        product["total_reserved"] += int(variant_reserved)
+        product["total_available"] += available
+    return overview
+
+
+async def get_low_stock_variants(db: AsyncSession, threshold: int = 10) -> List[dict]:
+    """Variants of active products with 0 <= available < threshold, lowest first (one query)"""
+    stock = stock_subquery()
+    total_stock = func.coalesce(stock.c.total_stock, 0)
+    reserved = func.coalesce(stock.c.reserved, 0)
+    available = total_stock - reserved
+    result = await db.execute(
+        select(
+            Product.id, Product.name, ProductVariant.id, ProductVariant.size, ProductVariant.color,
+            available, reserved, total_stock
+        )
+        .join(ProductVariant, ProductVariant.product_id == Product.id)
+        .outerjoin(stock, stock.c.variant_id == ProductVariant.id)
+        .where(and_(LISTED_PRODUCT, LIVE_VARIANT, available < threshold, available >= 0))
+        .order_by(available, Product.id, ProductVariant.id)
+    )
+    return [
+        {
+            "product_id": product_id,
+            "product_name": product_name,
+            "variant_id": variant_id,
+            "variant_size": size,
+            "variant_color": color,
+            "available": int(variant_available),
+            "reserved": int(variant_reserved),
+            "total": int(variant_total)
+        }
+        for (product_id, product_name, variant_id, size, color,
+             variant_available, variant_reserved, variant_total) in result.all()
+    ]
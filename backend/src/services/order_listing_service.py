@@ -0,0 +1,130 @@
+"""Fast path for admin order listings
+
+Admin order pages are built straight from SQL result tuples into plain
+dicts shaped like OrderWithUserResponse and encoded with orjson, skipping
+ORM object construction and FastAPI's response revalidation. A page is one
+statement whatever its size: the paged orders (with their user) are joined
+to their items, variants and products, and the flat rows are grouped back
+into orders here.
+"""
+from typing import Iterable, List
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Select, asc, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import Order, OrderItem, Product, ProductVariant, User
+
+
+def order_rows_query() -> Select:
+    """Orders joined with their user, as flat columns (filter/paginate on Order)"""
+    return select(
+        Order.id, Order.user_id, Order.status, Order.total_credits,
+        Order.created_at, Order.updated_at, Order.completed_at,
+        User.id.label("user_pk"), User.email.label("user_email"), User.name.label("user_name"),
+        User.start_date.label("user_start_date"), User.role.label("user_role"),
+        User.is_active.label("user_is_active"), User.created_at.label("user_created_at"),
+        User.updated_at.label("user_updated_at")
+    ).outerjoin(User, User.id == Order.user_id)
+
+
+def _user_payload(row) -> dict:
+    if row.user_pk is None:
+        return None
+    return {
+        "id": row.user_pk,
+        "email": row.user_email,
+        "name": row.user_name,
+        "start_date": row.user_start_date,
+        "role": row.user_role,
+        "is_active": row.user_is_active,
+        "created_at": row.user_created_at,
+        "updated_at": row.user_updated_at
+    }
+
+
+def _item_payload(row) -> dict:
+    return {
+        "id": row.item_id,
+        "order_id": row.id,
+        "variant_id": row.item_variant_id,
+        "quantity": row.item_quantity,
+        "unit_credits": row.item_unit_credits,
+        "total_credits": row.item_total_credits,
+        "created_at": row.item_created_at,
+        "product_name": row.product_name,
+        "variant_size": row.variant_size,
+        "variant_color": row.variant_color
+    }
+
+
+def _order_payload(row, items: List[dict]) -> dict:
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "user": _user_payload(row),
+        "status": row.status,
+        "total_credits": row.total_credits,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "completed_at": row.completed_at,
+        "items": items
+    }
+
+
+def order_items_query(page: Select, descending: bool = True) -> Select:
+    """
+    Join a page of order_rows_query() to its items, variants and products
+    
+    The page is filtered and limited as a subquery, so LIMIT counts orders,
+    not items. Rows come back by (created_at, id) in the page's direction
+    and then by item, so each order's rows are contiguous.
+    """
+    paged = page.subquery("order_page")
+    direction = desc if descending else asc
+    return (
+        select(
+            paged,
+            OrderItem.id.label("item_id"), OrderItem.variant_id.label("item_variant_id"),
+            OrderItem.quantity.label("item_quantity"), OrderItem.unit_credits.label("item_unit_credits"),
+            OrderItem.total_credits.label("item_total_credits"), OrderItem.created_at.label("item_created_at"),
+            Product.name.label("product_name"), ProductVariant.size.label("variant_size"),
+            ProductVariant.color.label("variant_color")
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == paged.c.id)
+        .outerjoin(ProductVariant, ProductVariant.id == OrderItem.variant_id)
+        .outerjoin(Product, Product.id == ProductVariant.product_id)
+        .order_by(direction(paged.c.created_at), direction(paged.c.id), OrderItem.id)
+    )
+
+
+async def load_order_payloads(db: AsyncSession, stmt: Select, descending: bool = True) -> List[dict]:
+    """
+    Run an order_rows_query() page in one round-trip and return enriched order dicts
+    
+    `stmt` must order by (created_at, id), newest first unless `descending`
+    is False, as paginate() does.
+    """
+    result = await db.execute(order_items_query(stmt, descending))
+    payloads: List[dict] = []
+    group_order_rows(result, payloads)
+    return payloads
+
+
+def group_order_rows(rows: Iterable, orders: List[dict]) -> None:
+    """
+    Append order_items_query() rows to `orders` as order dicts
+    
+    Rows continuing the last order in `orders` are added to its items, so
+    rows can be fed in batches.
+    """
+    for row in rows:
+        if not orders or orders[-1]["id"] != row.id:
+            orders.append(_order_payload(row, []))
+        if row.item_id is not None:
+            orders[-1]["items"].append(_item_payload(row))
+
+
+def fast_json_response(content) -> ORJSONResponse:
+    """Encode already-shaped payloads with orjson (no response_model revalidation)"""
+    return ORJSONResponse(content=content)
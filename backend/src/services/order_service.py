@@ -1,43 +1,114 @@
 """Order processing service"""
-from sqlalchemy.orm import Session
+from sqlalchemy import distinct, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime
-import redis
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from src.models import (
-    User, Product, ProductVariant, InventoryLot,
-    Order, OrderItem, OrderStatus
+    User, Product, ProductVariant, InventoryLot, LIVE_VARIANT,
+    Order, OrderItem, OrderStatus, CreditType
 )
 from src.schemas.schemas import OrderCreate
-from src.services.credit_service import get_user_balance, deduct_credits
-from src.core.config import settings
+from src.services.catalog_cache_service import invalidate_product_details
+from src.services.credit_service import add_ledger_entries, get_user_balance, deduct_credits
+from src.services.reservation_service import (
+    admit_order, confirm_holds, invalidate_counters, release_holds, reserve
+)
+from src.services.stock_events_service import publish_stock_changes
+
+
+async def get_order_with_items(db: AsyncSession, order_id: int) -> Optional[Order]:
+    """Load an order with its items (and user) eagerly, refreshing any cached copy"""
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.items), selectinload(Order.user))
+        .where(Order.id == order_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def lock_inventory(db: AsyncSession, variant_ids: Iterable[int]) -> Dict[int, InventoryLot]:
+    """
+    Lock the inventory rows for a set of variants with SELECT ... FOR UPDATE
+    
+    Rows are locked in id order so concurrent orders over overlapping variants
+    cannot deadlock. Returns the first lot per variant.
+    """
+    result = await db.execute(
+        select(InventoryLot)
+        .where(InventoryLot.variant_id.in_(sorted(set(variant_ids))))
+        .order_by(InventoryLot.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    inventory = {}
+    for lot in result.scalars().all():
+        inventory.setdefault(lot.variant_id, lot)
+    return inventory
 
 
-def process_order(db: Session, user: User, order_data: OrderCreate) -> Order:
+async def process_order(db: AsyncSession, user: User, order_data: OrderCreate) -> Order:
     """Process an order and deduct credits"""
+    # Total quantity requested per variant (a variant may appear on several lines)
+    requested: Dict[int, int] = {}
+    for item in order_data.items:
+        requested[item.variant_id] = requested.get(item.variant_id, 0) + item.quantity
+    
+    # One round-trip for all variants with their products
+    result = await db.execute(
+        select(ProductVariant, Product)
+        .join(Product, Product.id == ProductVariant.product_id)
+        .where(ProductVariant.id.in_(list(requested)), LIVE_VARIANT)
+    )
+    variants = {variant.id: (variant, product) for variant, product in result.all()}
+    
+    for variant_id in requested:
+        if variant_id not in variants:
+            raise ValueError(f"Variant {variant_id} not found")
+    
+    # Admit the order against Redis holds first so hot items are turned away
+    # before they contend for inventory row locks
+    holds = await admit_order(db, requested)
+    try:
+        order = await _place_order(db, user, order_data, requested, variants)
+    except Exception:
+        await release_holds(holds)
+        raise
+    
+    # The reservation is committed to Postgres; the holds are no longer needed
+    await confirm_holds(holds)
+    await invalidate_product_details(product.id for _, product in variants.values())
+    await publish_stock_changes(db, requested, "order_placed")
+    
+    return await get_order_with_items(db, order.id)
+
+
+async def _place_order(
+    db: AsyncSession,
+    user: User,
+    order_data: OrderCreate,
+    requested: Dict[int, int],
+    variants: Dict[int, tuple]
+) -> Order:
+    """Lock inventory, reserve stock, create the order and deduct credits"""
+    # One round-trip to lock all inventory rows touched by this order
+    inventory = await lock_inventory(db, requested)
+    
+    for variant_id, quantity in requested.items():
+        lot = inventory.get(variant_id)
+        if not lot or lot.quantity - lot.reserved_quantity < quantity:
+            raise ValueError(f"Insufficient inventory for variant {variant_id}")
+    
     # Calculate total credits
     total_credits = 0.0
     items_to_add = []
-    
     for item in order_data.items:
-        # Get variant and calculate credits
-        variant = db.query(ProductVariant).filter(
-            ProductVariant.id == item.variant_id
-        ).first()
-        if not variant:
-            raise ValueError(f"Variant {item.variant_id} not found")
-        
-        product = db.query(Product).filter(Product.id == variant.product_id).first()
+        variant, product = variants[item.variant_id]
         unit_credits = product.base_credits + variant.credits_modifier
         item_total = unit_credits * item.quantity
         total_credits += item_total
-        
-        # Check inventory
-        inventory = db.query(InventoryLot).filter(
-            InventoryLot.variant_id == item.variant_id
-        ).first()
-        if not inventory or inventory.quantity - inventory.reserved_quantity < item.quantity:
-            raise ValueError(f"Insufficient inventory for variant {item.variant_id}")
-        
         items_to_add.append({
             "variant_id": item.variant_id,
             "quantity": item.quantity,
@@ -45,8 +116,9 @@ def process_order(db: Session, user: User, order_data: OrderCreate) -> Order:
             "total_credits": item_total
         })
     
-    # Check user balance
-    balance = get_user_balance(db, user.id)
+    # Check user balance with the balance row locked, so two parallel orders
+    # from the same user cannot both spend it (locked after inventory, as in deny)
+    balance = await get_user_balance(db, user.id, for_update=True)
     if balance < total_credits:
         raise ValueError("Insufficient credits")
     
@@ -57,49 +129,38 @@ def process_order(db: Session, user: User, order_data: OrderCreate) -> Order:
         total_credits=total_credits
     )
     db.add(order)
-    db.flush()
+    await db.flush()
     
-    # Create order items and reserve inventory
-    for item_data in items_to_add:
-        order_item = OrderItem(
-            order_id=order.id,
-            **item_data
-        )
-        db.add(order_item)
-        
-        # Reserve inventory (don't deduct yet - only when admin fulfills)
-        inventory = db.query(InventoryLot).filter(
-            InventoryLot.variant_id == item_data["variant_id"]
-        ).first()
-        inventory.reserved_quantity += item_data["quantity"]
+    # Create order items
+    db.add_all([OrderItem(order_id=order.id, **item_data) for item_data in items_to_add])
+    
+    # Reserve inventory on the locked rows (don't deduct yet - only when admin fulfills)
+    for variant_id, quantity in requested.items():
+        inventory[variant_id].reserved_quantity += quantity
     
     # DEDUCT credits immediately when order is created
     # This prevents employees from submitting orders they can't afford
-    deduct_credits(db, user.id, total_credits, f"Order #{order.id} - Approved", order.id)
+    await deduct_credits(
+        db, user.id, total_credits, f"Order #{order.id} - Approved", order.id, commit=False
+    )
     
     # Order is auto-approved (PROCESSING status) and stays reserved until admin fulfills/denies
     
-    db.commit()
-    db.refresh(order)
+    # Single commit for the whole checkout (order, items, reservation, debit)
+    await db.commit()
     
     return order
 
 
-def fulfill_order(db: Session, order_id: int) -> Order:
+async def fulfill_order(db: AsyncSession, order_id: int) -> Order:
     """Fulfill an approved order - deduct inventory (credits already deducted)"""
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise ValueError("Order not found")
-    
-    if order.status != OrderStatus.PROCESSING:
-        raise ValueError(f"Order is not in processing status (status: {order.status})")
+    order = await _lock_order(db, order_id)
     
     # Deduct inventory from reserved
+    locked = await lock_inventory(db, [item.variant_id for item in order.items])
     for item in order.items:
-        inventory = db.query(InventoryLot).filter(
-            InventoryLot.variant_id == item.variant_id
-        ).first()
-        if inventory.reserved_quantity < item.quantity:
+        inventory = locked.get(item.variant_id)
+        if not inventory or inventory.reserved_quantity < item.quantity:
             raise ValueError(f"Insufficient reserved inventory for variant {item.variant_id}")
         inventory.reserved_quantity -= item.quantity
         inventory.quantity -= item.quantity
@@ -111,34 +172,29 @@ def fulfill_order(db: Session, order_id: int) -> Order:
     order.status = OrderStatus.COMPLETED
     order.completed_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    await publish_stock_changes(db, [item.variant_id for item in order.items], "order_fulfilled")
     
+    # The locked order already carries its items; callers build their own payloads
     return order
 
 
 # Keep old name for backwards compatibility (deprecated)
-def approve_order(db: Session, order_id: int) -> Order:
+async def approve_order(db: AsyncSession, order_id: int) -> Order:
     """DEPRECATED: Use fulfill_order instead. Approve a pending order - deduct inventory (credits already deducted)"""
-    return fulfill_order(db, order_id)
+    return await fulfill_order(db, order_id)
 
 
-def deny_order(db: Session, order_id: int, reason: str = None) -> Order:
+async def deny_order(db: AsyncSession, order_id: int, reason: str = None) -> Order:
     """Deny an approved order - release reserved inventory and REFUND credits"""
     from src.services.credit_service import grant_credits
     
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise ValueError("Order not found")
-    
-    if order.status != OrderStatus.PROCESSING:
-        raise ValueError(f"Order is not in processing status (status: {order.status})")
+    order = await _lock_order(db, order_id)
     
     # Release reserved inventory
+    locked = await lock_inventory(db, [item.variant_id for item in order.items])
     for item in order.items:
-        inventory = db.query(InventoryLot).filter(
-            InventoryLot.variant_id == item.variant_id
-        ).first()
+        inventory = locked.get(item.variant_id)
         if inventory:
             inventory.reserved_quantity -= item.quantity
     
@@ -146,42 +202,201 @@ def deny_order(db: Session, order_id: int, reason: str = None) -> Order:
     refund_description = f"Order #{order.id} - Refund (Denied)"
     if reason:
         refund_description += f": {reason}"
-    grant_credits(db, order.user_id, order.total_credits, refund_description, order.id)
+    await grant_credits(
+        db, order.user_id, order.total_credits, refund_description, order.id, commit=False
+    )
     
     # Update order status
     order.status = OrderStatus.CANCELLED
     
-    db.commit()
-    db.refresh(order)
+    await db.commit()
     
-    return order
+    # Released stock changes availability; reseed the Redis counters
+    variant_ids = [item.variant_id for item in order.items]
+    await invalidate_counters(variant_ids)
+    result = await db.execute(
+        select(distinct(ProductVariant.product_id)).where(ProductVariant.id.in_(variant_ids))
+    )
+    await invalidate_product_details(result.scalars().all())
+    await publish_stock_changes(db, variant_ids, "order_denied")
+    
+    return await get_order_with_items(db, order_id)
 
 
 # Keep old name for backwards compatibility (deprecated)
-def reject_order(db: Session, order_id: int, reason: str = None) -> Order:
+async def reject_order(db: AsyncSession, order_id: int, reason: str = None) -> Order:
     """DEPRECATED: Use deny_order instead. Reject a pending order - release reserved inventory and REFUND credits"""
-    return deny_order(db, order_id, reason)
+    return await deny_order(db, order_id, reason)
 
 
-def check_and_reserve_inventory(db: Session, variant_id: int, quantity: int) -> bool:
-    """Check and reserve inventory in Redis"""
-    redis_client = redis.from_url(settings.redis_url, decode_responses=False)
+async def _lock_order_batch(
+    db: AsyncSession,
+    order_ids: List[int]
+) -> Tuple[List[Order], Dict[int, dict]]:
+    """
+    Lock a batch of orders (FOR UPDATE, id order) with their items
     
-    key = f"inventory:reserved:{variant_id}"
-    inventory = db.query(InventoryLot).filter(
-        InventoryLot.variant_id == variant_id
-    ).first()
+    Returns the processing orders, plus a failed result for every other ID
+    (missing or not processing). Repeated IDs are processed once.
+    """
+    unique_ids = list(dict.fromkeys(order_ids))
+    failed: Dict[int, dict] = {}
     
-    if not inventory:
-        return False
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.items))
+        .where(Order.id.in_(unique_ids))
+        .order_by(Order.id)
+        .with_for_update(of=Order)
+        .execution_options(populate_existing=True)
+    )
+    found = {order.id: order for order in result.scalars().all()}
     
-    available = inventory.quantity - inventory.reserved_quantity
-    if available < quantity:
-        return False
+    orders = []
+    for order_id in unique_ids:
+        order = found.get(order_id)
+        if order is None:
+            failed[order_id] = {"order_id": order_id, "status": "failed", "detail": "Order not found"}
+        elif order.status != OrderStatus.PROCESSING:
+            failed[order_id] = {
+                "order_id": order_id,
+                "status": "failed",
+                "detail": f"Order is not in processing status (status: {order.status})"
+            }
+        else:
+            orders.append(order)
+    return orders, failed
+
+
+async def _lock_order(db: AsyncSession, order_id: int) -> Order:
+    """Lock one processing order like a batch of one; raises ValueError otherwise"""
+    orders, failed = await _lock_order_batch(db, [order_id])
+    if failed:
+        raise ValueError(failed[order_id]["detail"])
+    return orders[0]
+
+
+def _order_demand(order: Order) -> Dict[int, int]:
+    demand: Dict[int, int] = {}
+    for item in order.items:
+        demand[item.variant_id] = demand.get(item.variant_id, 0) + item.quantity
+    return demand
+
+
+def _batch_results(order_ids: List[int], done: Dict[int, dict], failed: Dict[int, dict]) -> List[dict]:
+    """Per-order results in request order (each ID once)"""
+    return [done.get(order_id) or failed[order_id] for order_id in dict.fromkeys(order_ids)]
+
+
+async def fulfill_orders(db: AsyncSession, order_ids: List[int]) -> List[dict]:
+    """
+    Fulfill many processing orders in one transaction
     
-    # Reserve in Redis (simple counter)
-    current_reserved = redis_client.get(key) or 0
-    redis_client.set(key, int(current_reserved) + quantity, ex=300)  # 5 minute expiry
+    Inventory rows are locked once for the whole batch and decremented once
+    per variant by the summed quantities; statuses are set with a single
+    UPDATE. An order whose reserved stock falls short fails on its own
+    without blocking the rest. Returns a result per requested order.
+    """
+    orders, failed = await _lock_order_batch(db, order_ids)
+    demands = {order.id: _order_demand(order) for order in orders}
+    locked = await lock_inventory(db, {vid for demand in demands.values() for vid in demand})
     
-    return True
+    # Allocate in order-id order from what each variant has reserved
+    remaining = {variant_id: lot.reserved_quantity for variant_id, lot in locked.items()}
+    totals: Dict[int, int] = {}
+    done: Dict[int, dict] = {}
+    for order in orders:
+        demand = demands[order.id]
+        short = [vid for vid, quantity in demand.items() if remaining.get(vid, 0) < quantity]
+        if short:
+            failed[order.id] = {
+                "order_id": order.id,
+                "status": "failed",
+                "detail": f"Insufficient reserved inventory for variant {short[0]}"
+            }
+            continue
+        for variant_id, quantity in demand.items():
+            remaining[variant_id] -= quantity
+            totals[variant_id] = totals.get(variant_id, 0) + quantity
+        done[order.id] = {"order_id": order.id, "status": "fulfilled", "detail": None}
+    
+    for variant_id, quantity in totals.items():
+        locked[variant_id].reserved_quantity -= quantity
+        locked[variant_id].quantity -= quantity
+    if done:
+        await db.execute(
+            update(Order)
+            .where(Order.id.in_(list(done)))
+            .values(status=OrderStatus.COMPLETED, completed_at=datetime.utcnow()),
+            execution_options={"synchronize_session": False}
+        )
+    await db.commit()
+    
+    await publish_stock_changes(db, list(totals), "order_fulfilled")
+    return _batch_results(order_ids, done, failed)
 
+
+async def deny_orders(db: AsyncSession, order_ids: List[int], reason: str = None) -> List[dict]:
+    """
+    Deny many processing orders in one transaction
+    
+    Reserved stock is released once per variant by the summed quantities,
+    refunds are bulk-inserted into the ledger with one balance upsert, and
+    statuses are set with a single UPDATE. Returns a result per requested
+    order.
+    """
+    orders, failed = await _lock_order_batch(db, order_ids)
+    totals: Dict[int, int] = {}
+    for order in orders:
+        for variant_id, quantity in _order_demand(order).items():
+            totals[variant_id] = totals.get(variant_id, 0) + quantity
+    
+    locked = await lock_inventory(db, list(totals))
+    for variant_id, quantity in totals.items():
+        inventory = locked.get(variant_id)
+        if inventory:
+            inventory.reserved_quantity -= quantity
+    
+    refunds = []
+    for order in orders:
+        description = f"Order #{order.id} - Refund (Denied)"
+        if reason:
+            description += f": {reason}"
+        refunds.append({
+            "user_id": order.user_id,
+            "amount": order.total_credits,
+            "credit_type": CreditType.GRANT,
+            "description": description,
+            "reference_order_id": order.id
+        })
+    await add_ledger_entries(db, refunds)
+    
+    done = {order.id: {"order_id": order.id, "status": "denied", "detail": None} for order in orders}
+    if done:
+        await db.execute(
+            update(Order)
+            .where(Order.id.in_(list(done)))
+            .values(status=OrderStatus.CANCELLED),
+            execution_options={"synchronize_session": False}
+        )
+    await db.commit()
+    
+    # Released stock changes availability; reseed the Redis counters
+    variant_ids = list(totals)
+    if variant_ids:
+        await invalidate_counters(variant_ids)
+        result = await db.execute(
+            select(distinct(ProductVariant.product_id)).where(ProductVariant.id.in_(variant_ids))
+        )
+        await invalidate_product_details(result.scalars().all())
+        await publish_stock_changes(db, variant_ids, "order_denied")
+    return _batch_results(order_ids, done, failed)
+
+
+async def check_and_reserve_inventory(db: AsyncSession, variant_id: int, quantity: int) -> bool:
+    """DEPRECATED: Use reservation_service.reserve instead. Place a TTL hold on a variant in Redis"""
+    try:
+        await reserve(db, variant_id, quantity)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,201 @@
+"""Purge of soft-deleted products and variants
+
+Admin deletes only stamp deleted_at and return. This job removes the rows
+afterwards in batches of at most PURGE_BATCH_SIZE, each in its own short
+transaction:
+
+1. order items of deleted products (deleting a product drops its order history)
+2. orders step 1 left without items, backing their ledger entries out of balances
+3. deleted variants no order item references, with their inventory lots
+4. deleted products without variants, then their images if no product uses them
+
+Batches are picked with NOT EXISTS anti-joins and locked FOR UPDATE SKIP
+LOCKED, so workers running the job at the same time split the rows instead of
+waiting on each other. A variant deleted on its own that is still in an
+order is kept as a tombstone for that order's history. Other orders without
+items are only removed by the admin cleanup endpoint (purge_empty_orders
+without order ids).
+"""
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, Collection, Dict, Optional, Set
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.models import InventoryLot, Order, OrderItem, Product, ProductVariant
+from src.services.credit_service import delete_order_ledger_entries
+from src.utils.file_storage import delete_file
+
+
+async def release_image(db: AsyncSession, image_url: str) -> None:
+    """Delete an image file unless a product still uses it (uploads are content-addressed)"""
+    in_use = await db.scalar(
+        select(func.count(Product.id)).where(Product.image_url == image_url)
+    )
+    if not in_use:
+        await delete_file(image_url)
+
+
+async def purge_deleted_product_items(db: AsyncSession, batch_size: int, order_ids: Set[int]) -> int:
+    """Delete one batch of order items whose product is deleted, adding their orders to order_ids"""
+    batch = (
+        select(OrderItem.id)
+        .join(ProductVariant, ProductVariant.id == OrderItem.variant_id)
+        .join(Product, Product.id == ProductVariant.product_id)
+        .where(Product.deleted_at.isnot(None))
+        .limit(batch_size)
+        .with_for_update(of=OrderItem, skip_locked=True)
+    )
+    result = await db.execute(
+        delete(OrderItem).where(OrderItem.id.in_(batch)).returning(OrderItem.order_id),
+        execution_options={"synchronize_session": False}
+    )
+    deleted = result.scalars().all()
+    await db.commit()
+    order_ids.update(deleted)
+    return len(deleted)
+
+
+async def purge_empty_orders(
+    db: AsyncSession,
+    batch_size: int,
+    order_ids: Optional[Collection[int]] = None
+) -> int:
+    """Delete one batch of orders without items (only among order_ids if given), with their ledger entries"""
+    has_items = select(OrderItem.id).where(OrderItem.order_id == Order.id).exists()
+    stmt = select(Order.id).where(~has_items)
+    if order_ids is not None:
+        stmt = stmt.where(Order.id.in_(order_ids))
+    result = await db.execute(stmt.limit(batch_size).with_for_update(skip_locked=True))
+    empty_ids = result.scalars().all()
+    if empty_ids:
+        await delete_order_ledger_entries(db, empty_ids)
+        await db.execute(
+            delete(Order).where(Order.id.in_(empty_ids)),
+            execution_options={"synchronize_session": False}
+        )
+    await db.commit()
+    return len(empty_ids)
+
+
+async def purge_deleted_variants(db: AsyncSession, batch_size: int) -> int:
+    """Delete one batch of unreferenced deleted variants and their inventory lots"""
+    ordered = select(OrderItem.id).where(OrderItem.variant_id == ProductVariant.id).exists()
+    result = await db.execute(
+        select(ProductVariant.id)
+        .where(ProductVariant.deleted_at.isnot(None), ~ordered)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    variant_ids = result.scalars().all()
+    if variant_ids:
+        await db.execute(
+            delete(InventoryLot).where(InventoryLot.variant_id.in_(variant_ids)),
+            execution_options={"synchronize_session": False}
+        )
+        await db.execute(
+            delete(ProductVariant).where(ProductVariant.id.in_(variant_ids)),
+            execution_options={"synchronize_session": False}
+        )
+    await db.commit()
+    return len(variant_ids)
+
+
+async def purge_deleted_products(db: AsyncSession, batch_size: int) -> int:
+    """Delete one batch of deleted products without variants, then their unused images"""
+    has_variants = select(ProductVariant.id).where(ProductVariant.product_id == Product.id).exists()
+    result = await db.execute(
+        select(Product.id, Product.image_url)
+        .where(Product.deleted_at.isnot(None), ~has_variants)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if rows:
+        await db.execute(
+            delete(Product).where(Product.id.in_([product_id for product_id, _ in rows])),
+            execution_options={"synchronize_session": False}
+        )
+    await db.commit()
+
+    for image_url in {image_url for _, image_url in rows if image_url}:
+        await release_image(db, image_url)
+    return len(rows)
+
+
+async def purge_in_batches(
+    step: Callable[[AsyncSession, int], Awaitable[int]],
+    batch_size: Optional[int] = None
+) -> int:
+    """Run a purge step batch after batch until one comes back short; returns rows removed"""
+    batch_size = batch_size or settings.purge_batch_size
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            removed = await step(db, batch_size)
+        total += removed
+        if removed < batch_size:
+            return total
+
+
+async def run_purge(batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Run every purge step in dependency order and count what each removed"""
+    emptied: Set[int] = set()
+    return {
+        "order_items": await purge_in_batches(
+            partial(purge_deleted_product_items, order_ids=emptied), batch_size
+        ),
+        "orders": await purge_in_batches(
+            partial(purge_empty_orders, order_ids=emptied), batch_size
+        ) if emptied else 0,
+        "variants": await purge_in_batches(purge_deleted_variants, batch_size),
+        "products": await purge_in_batches(purge_deleted_products, batch_size)
+    }
+
+
+class PurgeWorker:
+    """Runs run_purge in this worker on start, every PURGE_INTERVAL_SECONDS and when woken"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    def start(self) -> None:
+        if settings.purge_interval_seconds <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self) -> None:
+        """Purge soon (after an admin delete) instead of at the next interval"""
+        self._wake.set()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                summary = await run_purge()
+                if any(summary.values()):
+                    print(f"🧹 Purged {', '.join(f'{count} {name}' for name, count in summary.items())}")
+            except Exception as e:
+                # Keep the worker alive whatever failed (database, storage, ...)
+                print(f"⚠️  Purge failed, retrying later: {e!r}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.purge_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+purge_worker = PurgeWorker()
@@ -0,0 +1,210 @@
+"""Atomic Redis inventory reservations with TTL holds
+
+Each variant has an availability counter seeded from InventoryLot
+(quantity - reserved_quantity) and a sorted set of active holds scored by
+expiry. Reserving, releasing and confirming a hold are single Lua scripts,
+so concurrent callers cannot race. Expired holds are returned to the counter
+the next time the variant is touched.
+
+Postgres stays authoritative: a confirmed hold is one whose quantity has been
+written to reserved_quantity in the same transaction that created the order.
+Counters expire INVENTORY_COUNTER_TTL_SECONDS after seeding (INCRBY/DECRBY keep
+the TTL), so a reseed that raced an order commit cannot skew them for long.
+"""
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import async_redis_client
+from src.models import InventoryLot
+
+
+# A hold is (variant_id, hold member, quantity); the member encodes "<uuid>:<quantity>"
+Hold = Tuple[int, str, int]
+
+NEEDS_SEED = -2
+INSUFFICIENT = -1
+
+# Return expired holds (members end in ":<quantity>") to the counter
+_RELEASE_EXPIRED = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+if #expired > 0 then
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        for _, member in ipairs(expired) do
+            redis.call('INCRBY', KEYS[1], tonumber(string.match(member, ':(%d+)$')))
+        end
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+end
+"""
+
+# KEYS: counter, holds, hold key | ARGV: now_ms, quantity, member, ttl_ms
+RESERVE_SCRIPT = _RELEASE_EXPIRED + """
+local available = redis.call('GET', KEYS[1])
+if not available then
+    return -2
+end
+local quantity = tonumber(ARGV[2])
+if tonumber(available) < quantity then
+    return -1
+end
+redis.call('DECRBY', KEYS[1], quantity)
+redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[4]), ARGV[3])
+redis.call('SET', KEYS[3], ARGV[2], 'PX', ARGV[4])
+return tonumber(available) - quantity
+"""
+
+# KEYS: counter, holds, hold key | ARGV: now_ms, member, restore (1 = release, 0 = confirm)
+FINISH_SCRIPT = _RELEASE_EXPIRED + """
+redis.call('DEL', KEYS[3])
+if redis.call('ZREM', KEYS[2], ARGV[2]) == 0 then
+    return 0
+end
+if ARGV[3] == '1' and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('INCRBY', KEYS[1], tonumber(string.match(ARGV[2], ':(%d+)$')))
+end
+return 1
+"""
+
+# KEYS: counter, holds | ARGV: now_ms, db_available, counter_ttl_ms
+SEED_SCRIPT = _RELEASE_EXPIRED + """
+local held = 0
+for _, member in ipairs(redis.call('ZRANGE', KEYS[2], 0, -1)) do
+    held = held + tonumber(string.match(member, ':(%d+)$'))
+end
+redis.call('SET', KEYS[1], tonumber(ARGV[2]) - held, 'PX', ARGV[3], 'NX')
+return tonumber(redis.call('GET', KEYS[1]))
+"""
+
+_reserve = async_redis_client.register_script(RESERVE_SCRIPT)
+_finish = async_redis_client.register_script(FINISH_SCRIPT)
+_seed = async_redis_client.register_script(SEED_SCRIPT)
+
+
+def _counter_key(variant_id: int) -> str:
+    # Hash tags keep a variant's keys in one slot on Redis Cluster
+    return f"inventory:{{{variant_id}}}:available"
+
+
+def _holds_key(variant_id: int) -> str:
+    return f"inventory:{{{variant_id}}}:holds"
+
+
+def _hold_key(variant_id: int, member: str) -> str:
+    return f"inventory:{{{variant_id}}}:hold:{member}"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+async def seed_counter(db: AsyncSession, variant_id: int) -> int:
+    """Seed a variant's counter from InventoryLot, net of active holds (no-op if present)"""
+    result = await db.execute(
+        select(func.sum(InventoryLot.quantity - InventoryLot.reserved_quantity)).where(
+            InventoryLot.variant_id == variant_id
+        )
+    )
+    db_available = int(result.scalar() or 0)
+    return await _seed(
+        keys=[_counter_key(variant_id), _holds_key(variant_id)],
+        args=[_now_ms(), db_available, settings.inventory_counter_ttl_seconds * 1000]
+    )
+
+
+async def reserve(
+    db: AsyncSession,
+    variant_id: int,
+    quantity: int,
+    ttl_seconds: Optional[int] = None
+) -> Hold:
+    """
+    Atomically place a TTL hold on a variant's stock
+
+    Raises:
+        ValueError: If not enough stock is available
+    """
+    ttl_ms = (ttl_seconds or settings.inventory_hold_ttl_seconds) * 1000
+    member = f"{uuid.uuid4().hex}:{quantity}"
+    keys = [_counter_key(variant_id), _holds_key(variant_id), _hold_key(variant_id, member)]
+
+    remaining = await _reserve(keys=keys, args=[_now_ms(), quantity, member, ttl_ms])
+    if remaining == NEEDS_SEED:
+        await seed_counter(db, variant_id)
+        remaining = await _reserve(keys=keys, args=[_now_ms(), quantity, member, ttl_ms])
+    if remaining < 0:
+        raise ValueError(f"Insufficient inventory for variant {variant_id}")
+    return variant_id, member, quantity
+
+
+async def _finish_hold(hold: Hold, restore: bool) -> bool:
+    variant_id, member, _ = hold
+    finished = await _finish(
+        keys=[_counter_key(variant_id), _holds_key(variant_id), _hold_key(variant_id, member)],
+        args=[_now_ms(), member, "1" if restore else "0"]
+    )
+    return finished == 1
+
+
+async def release(hold: Hold) -> bool:
+    """Cancel a hold and return its quantity to the counter"""
+    return await _finish_hold(hold, restore=True)
+
+
+async def confirm(hold: Hold) -> bool:
+    """Drop a hold whose quantity is now recorded in reserved_quantity"""
+    return await _finish_hold(hold, restore=False)
+
+
+async def admit_order(db: AsyncSession, requested: Dict[int, int]) -> List[Hold]:
+    """
+    Admit an order in Redis before it reaches Postgres
+
+    Takes a hold per variant (in variant id order); if any variant is short,
+    the holds already taken are released and ValueError is raised. If Redis
+    is unavailable no holds are taken and Postgres alone decides.
+    """
+    holds: List[Hold] = []
+    try:
+        for variant_id in sorted(requested):
+            holds.append(await reserve(db, variant_id, requested[variant_id]))
+    except ValueError:
+        await release_holds(holds)
+        raise
+    except redis.RedisError:
+        await release_holds(holds)
+        return []
+    return holds
+
+
+async def release_holds(holds: List[Hold]) -> None:
+    """Release holds, ignoring Redis errors (expired holds are reclaimed anyway)"""
+    for hold in holds:
+        try:
+            await release(hold)
+        except redis.RedisError:
+            pass
+
+
+async def confirm_holds(holds: List[Hold]) -> None:
+    """Confirm holds after the order's reservation has been committed to Postgres"""
+    for hold in holds:
+        try:
+            await confirm(hold)
+        except redis.RedisError:
+            pass
+
+
+async def invalidate_counters(variant_ids: List[int]) -> None:
+    """Drop counters so they are reseeded from InventoryLot on next use"""
+    if not variant_ids:
+        return
+    try:
+        await async_redis_client.delete(*[_counter_key(variant_id) for variant_id in variant_ids])
+    except redis.RedisError:
+        pass
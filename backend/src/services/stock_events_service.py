@@ -0,0 +1,186 @@
+"""Stock-change events over Redis pub/sub
+
+Inventory mutations publish one "stock_changed" event per touched variant on
+the stock:events channel, after their commit. Each variant's last published
+availability is kept in a Redis hash, so crossing LOW_STOCK_THRESHOLD also
+publishes a "low_stock", "out_of_stock" or "restocked" alert. Publishing is
+best-effort: a Redis outage never fails the mutation.
+
+Each worker holds a single subscription (StockEventHub) and fans messages
+out to its connected Server-Sent Events clients.
+"""
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Set
+
+import orjson
+import redis
+from fastapi import Request
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import async_redis_client
+from src.models import Product, ProductVariant
+from src.services.inventory_service import stock_subquery
+
+
+STOCK_EVENTS_CHANNEL = "stock:events"
+LAST_AVAILABLE_KEY = "stock:last_available"
+# Events buffered per SSE client; a slower client loses the oldest ones
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+
+# KEYS: last-available hash | ARGV: variant_id, available, ... | returns previous values ('' if none)
+SWAP_AVAILABLE_SCRIPT = """
+local previous = {}
+for i = 1, #ARGV, 2 do
+    previous[#previous + 1] = redis.call('HGET', KEYS[1], ARGV[i]) or ''
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return previous
+"""
+
+_swap_available = async_redis_client.register_script(SWAP_AVAILABLE_SCRIPT)
+
+
+def stock_alert(previous: Optional[int], available: int, threshold: int) -> Optional[str]:
+    """Name the threshold crossed between two availabilities, if any"""
+    if available <= 0:
+        return "out_of_stock" if previous is None or previous > 0 else None
+    if available < threshold:
+        return "low_stock" if previous is None or previous >= threshold or previous <= 0 else None
+    return "restocked" if previous is not None and previous < threshold else None
+
+
+async def publish_stock_changes(db: AsyncSession, variant_ids: Iterable[int], reason: str) -> None:
+    """
+    Publish current stock for variants after a committed inventory change
+
+    One query for the variants' stock, one script call for the previous
+    availabilities, one pipelined round-trip for the messages.
+    """
+    variant_ids = sorted(set(variant_ids))
+    if not variant_ids:
+        return
+
+    stock = stock_subquery()
+    total_stock = func.coalesce(stock.c.total_stock, 0)
+    reserved = func.coalesce(stock.c.reserved, 0)
+    try:
+        result = await db.execute(
+            select(
+                ProductVariant.id, ProductVariant.product_id, Product.name,
+                ProductVariant.size, ProductVariant.color, total_stock, reserved
+            )
+            .join(Product, Product.id == ProductVariant.product_id)
+            .outerjoin(stock, stock.c.variant_id == ProductVariant.id)
+            .where(ProductVariant.id.in_(variant_ids))
+        )
+        rows = result.all()
+        if not rows:
+            return
+
+        swap_args = []
+        for row in rows:
+            swap_args += [row[0], int(row[5]) - int(row[6])]
+        previous_values = await _swap_available(keys=[LAST_AVAILABLE_KEY], args=swap_args)
+
+        at = datetime.utcnow()
+        threshold = settings.low_stock_threshold
+        pipe = async_redis_client.pipeline(transaction=False)
+        for (variant_id, product_id, product_name, size, color, total, held), previous in zip(rows, previous_values):
+            available = int(total) - int(held)
+            event = {
+                "type": "stock_changed",
+                "variant_id": variant_id,
+                "product_id": product_id,
+                "product_name": product_name,
+                "variant_size": size,
+                "variant_color": color,
+                "available": available,
+                "reserved": int(held),
+                "total": int(total),
+                "previous_available": int(previous) if previous != "" else None,
+                "reason": reason,
+                "at": at
+            }
+            pipe.publish(STOCK_EVENTS_CHANNEL, orjson.dumps(event))
+            alert = stock_alert(event["previous_available"], available, threshold)
+            if alert:
+                pipe.publish(STOCK_EVENTS_CHANNEL, orjson.dumps({**event, "type": alert, "threshold": threshold}))
+        await pipe.execute()
+    except (redis.RedisError, SQLAlchemyError) as e:
+        print(f"⚠️  Stock event publish failed: {e}")
+
+
+class StockEventHub:
+    """Fans the stock:events channel out to this worker's SSE clients over one subscription"""
+
+    def __init__(self):
+        self._queues: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._queues.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._queues.discard(queue)
+        if not self._queues and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _broadcast(self, data: str) -> None:
+        for queue in list(self._queues):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def _listen(self) -> None:
+        while self._queues:
+            pubsub = async_redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(STOCK_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._broadcast(message["data"])
+            except redis.RedisError as e:
+                print(f"⚠️  Stock event subscription lost, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+stock_event_hub = StockEventHub()
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one Server-Sent Events message"""
+    payload = data if isinstance(data, str) else orjson.dumps(data).decode()
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stock_event_stream(request: Request, low_stock: List[dict]) -> AsyncIterator[str]:
+    """
+    SSE body: the current low-stock list, then live events
+
+    A comment line every KEEPALIVE_SECONDS keeps proxies from closing an
+    idle stream and notices disconnected clients.
+    """
+    queue = stock_event_hub.subscribe()
+    try:
+        yield format_sse("low_stock_snapshot", {"threshold": settings.low_stock_threshold, "items": low_stock})
+        while not await request.is_disconnected():
+            try:
+                data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(orjson.loads(data)["type"], data)
+    finally:
+        stock_event_hub.unsubscribe(queue)
@@ -0,0 +1,194 @@
+"""Streaming user import service (CSV / NDJSON)"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.principal_cache import invalidate_users
+from src.models import User
+from src.schemas.schemas import UserImport
+from src.services.allocation_service import prorate_allocation, write_allocations
+
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+def detect_import_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Pick csv or ndjson from the upload's filename or content type"""
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+def iter_import_rows(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Lazily parse an upload into (row number, raw row, parse error) tuples
+    
+    Only one line is held in memory at a time.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    
+    for line_no, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Row must be a JSON object"
+            continue
+        yield line_no, row, None
+
+
+class ImportReport:
+    """Counters and a bounded list of per-row errors"""
+    
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.credited = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+    
+    def add_error(self, row: int, error: str, email: Optional[str] = None) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "email": email, "error": error})
+    
+    def as_dict(self) -> dict:
+        return {
+            "message": f"{self.inserted} users imported, {self.updated} updated",
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "credited": self.credited,
+            "failed_count": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+
+async def _upsert_batch(
+    db: AsyncSession,
+    batch: dict,
+    grant_initial_credits: bool,
+    report: ImportReport
+) -> None:
+    """Upsert one batch of validated users (keyed by email) in a single transaction"""
+    emails = list(batch.keys())
+    try:
+        result = await db.execute(select(User.email).where(User.email.in_(emails)))
+        existing = set(result.scalars().all())
+    
+        stmt = pg_insert(User).values([
+            {
+                "email": email,
+                "name": user.name,
+                "start_date": user.start_date,
+                "role": user.role,
+                "is_active": True
+            }
+            for email, (_, user) in batch.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.email],
+            set_={
+                "name": stmt.excluded.name,
+                "start_date": stmt.excluded.start_date,
+                "role": stmt.excluded.role,
+                "updated_at": func.now()
+            }
+        ).returning(User.id, User.email)
+        result = await db.execute(stmt)
+        ids = dict((email, user_id) for user_id, email in result.all())
+    
+        credited = {}
+        if grant_initial_credits:
+            year = datetime.utcnow().year
+            amounts = {
+                ids[email]: prorate_allocation(user.role, user.start_date, year)
+                for email, (_, user) in batch.items()
+                if email not in existing
+            }
+            amounts = {user_id: amount for user_id, amount in amounts.items() if amount > 0}
+            if amounts:
+                credited = await write_allocations(db, year, amounts, "Initial credits (import)")
+    
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        for email, (row_no, _) in batch.items():
+            report.add_error(row_no, str(e), email)
+        return
+    
+    # Role changes must not outlive the cached principals of existing users
+    await invalidate_users(existing)
+    report.inserted += sum(1 for email in emails if email not in existing)
+    report.updated += sum(1 for email in emails if email in existing)
+    report.credited += len(credited)
+
+
+async def import_users_stream(
+    db: AsyncSession,
+    stream: BinaryIO,
+    fmt: str,
+    grant_initial_credits: bool = False,
+    batch_size: int = IMPORT_BATCH_SIZE
+) -> dict:
+    """
+    Import users from a CSV or NDJSON stream with batched upserts on email
+    
+    Invalid rows are reported and skipped; a later row for the same email
+    overwrites an earlier one. Memory is bounded by the batch size.
+    """
+    report = ImportReport()
+    batch = {}
+    
+    for row_no, raw, error in iter_import_rows(stream, fmt):
+        report.processed += 1
+        if error:
+            report.add_error(row_no, error)
+            continue
+    
+        try:
+            user = UserImport(**{
+                key.strip(): value
+                for key, value in raw.items()
+                if isinstance(key, str) and value not in (None, "")
+            })
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(part) for part in first["loc"])
+            report.add_error(row_no, f"{field}: {first['msg']}", raw.get("email"))
+            continue
+    
+        email = user.email.lower().strip()
+        batch.pop(email, None)
+        batch[email] = (row_no, user)
+    
+        if len(batch) >= batch_size:
+            await _upsert_batch(db, batch, grant_initial_credits, report)
+            batch = {}
+    
+    if batch:
+        await _upsert_batch(db, batch, grant_initial_credits, report)
+    
+    return report.as_dict()
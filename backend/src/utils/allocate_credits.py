@@ -0,0 +1,31 @@
+"""Run the annual CapyCoin allocation (idempotent per year, resumable after a crash)"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from src.core.database import AsyncSessionLocal, init_db
+from src.services.allocation_service import ALLOCATION_CHUNK_SIZE, run_annual_allocation
+
+
+async def allocate(year: int, chunk_size: int, dry_run: bool) -> dict:
+    """Run the allocation for a year and print a summary"""
+    async with AsyncSessionLocal() as db:
+        summary = await run_annual_allocation(db, year, chunk_size=chunk_size, dry_run=dry_run)
+    
+    mode = " (dry run)" if dry_run else ""
+    print(f"💰 Annual allocation {year}{mode}")
+    print(f"   - Already allocated before this run: {summary['previously_allocated_count']}")
+    print(f"   - Allocated now: {summary['allocated_count']} user(s), "
+          f"{summary['allocated_credits']} capycoins in {summary['chunks']} chunk(s)")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--year", type=int, default=datetime.utcnow().year)
+    parser.add_argument("--chunk-size", type=int, default=ALLOCATION_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    
+    init_db()
+    asyncio.run(allocate(args.year, args.chunk_size, args.dry_run))
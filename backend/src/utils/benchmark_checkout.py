@@ -0,0 +1,160 @@
+"""Checkout latency benchmark (checkout, fulfil and deny)
+
+Runs the order service against the configured database and reports latency
+percentiles and commits per operation. ``--mode legacy`` replays the old
+behaviour, where the credit service committed in the middle of each
+checkout/deny, so both modes can be compared on the same database.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import delete, event, select
+
+from src.core.database import AsyncSessionLocal, async_engine, init_db
+from src.models import (
+    CreditAllocation, CreditLedger, InventoryLot, Order, OrderItem,
+    Product, ProductVariant, User, UserBalance, UserRole
+)
+from src.schemas.schemas import OrderCreate, OrderItemCreate
+from src.services import credit_service, order_service
+
+
+class CommitCounter:
+    """Counts COMMITs issued on the async engine"""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(async_engine.sync_engine, "commit", self._on_commit)
+
+    def _on_commit(self, conn):
+        self.count += 1
+
+    def close(self):
+        event.remove(async_engine.sync_engine, "commit", self._on_commit)
+
+
+def _use_legacy_credit_commits() -> None:
+    """Make the order service commit inside every credit call, as before unit-of-work"""
+    grant, deduct = credit_service.grant_credits, credit_service.deduct_credits
+
+    async def legacy_grant(*args, **kwargs):
+        kwargs["commit"] = True
+        return await grant(*args, **kwargs)
+
+    async def legacy_deduct(*args, **kwargs):
+        kwargs["commit"] = True
+        return await deduct(*args, **kwargs)
+
+    credit_service.grant_credits = legacy_grant
+    order_service.deduct_credits = legacy_deduct
+
+
+def _summary(name: str, samples: List[float], commits: int) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "operation": name,
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "commits_per_op": round(commits / len(samples), 2)
+    }
+
+
+async def create_fixture(credits: float, stock: int):
+    """Create a throwaway user with credits and a hidden product with stock"""
+    tag = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        user = User(
+            email=f"benchmark+{tag}@capyx.local",
+            name="Checkout Benchmark",
+            start_date=datetime.utcnow(),
+            role=UserRole.EMPLOYEE
+        )
+        product = Product(name=f"Benchmark product {tag}", base_credits=1.0, is_active=False)
+        db.add_all([user, product])
+        await db.flush()
+        variant = ProductVariant(product_id=product.id, size="M", credits_modifier=0.0)
+        db.add(variant)
+        await db.flush()
+        db.add(InventoryLot(variant_id=variant.id, quantity=stock))
+        await db.commit()
+        await credit_service.grant_credits(db, user.id, credits, "Benchmark credits")
+        return user.id, product.id, variant.id
+
+
+async def drop_fixture(user_id: int, product_id: int, variant_id: int) -> None:
+    """Remove everything create_fixture made, including orders and ledger rows"""
+    async with AsyncSessionLocal() as db:
+        order_ids = select(Order.id).where(Order.user_id == user_id)
+        await db.execute(delete(CreditLedger).where(CreditLedger.user_id == user_id))
+        await db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+        await db.execute(delete(Order).where(Order.user_id == user_id))
+        await db.execute(delete(CreditAllocation).where(CreditAllocation.user_id == user_id))
+        await db.execute(delete(UserBalance).where(UserBalance.user_id == user_id))
+        await db.execute(delete(InventoryLot).where(InventoryLot.variant_id == variant_id))
+        await db.execute(delete(ProductVariant).where(ProductVariant.id == variant_id))
+        await db.execute(delete(Product).where(Product.id == product_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def run_benchmark(iterations: int = 200, mode: str = "uow") -> List[Dict]:
+    """Time checkout, fulfil and deny over `iterations` orders each"""
+    if mode == "legacy":
+        _use_legacy_credit_commits()
+
+    user_id, product_id, variant_id = await create_fixture(
+        credits=float(iterations * 4), stock=iterations * 4
+    )
+    order_data = OrderCreate(items=[OrderItemCreate(variant_id=variant_id, quantity=1)])
+    counter = CommitCounter()
+    timings = {"checkout": [], "fulfil": [], "deny": []}
+    commits = {"checkout": 0, "fulfil": 0, "deny": 0}
+
+    try:
+        for i in range(iterations * 2):
+            async with AsyncSessionLocal() as db:
+                user = await db.get(User, user_id)
+                before = counter.count
+                started = time.perf_counter()
+                order = await order_service.process_order(db, user, order_data)
+                timings["checkout"].append(time.perf_counter() - started)
+                commits["checkout"] += counter.count - before
+
+            async with AsyncSessionLocal() as db:
+                operation = "fulfil" if i % 2 == 0 else "deny"
+                before = counter.count
+                started = time.perf_counter()
+                if operation == "fulfil":
+                    await order_service.fulfill_order(db, order.id)
+                else:
+                    await order_service.deny_order(db, order.id, "benchmark")
+                timings[operation].append(time.perf_counter() - started)
+                commits[operation] += counter.count - before
+    finally:
+        counter.close()
+        await drop_fixture(user_id, product_id, variant_id)
+
+    return [_summary(name, samples, commits[name]) for name, samples in timings.items()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--mode", choices=["uow", "legacy"], default="uow")
+    args = parser.parse_args()
+
+    init_db()
+    results = asyncio.run(run_benchmark(args.iterations, args.mode))
+    print(f"⏱️  Checkout benchmark ({args.mode}, {args.iterations} orders per operation)")
+    for row in results:
+        print(
+            f"   - {row['operation']:<8} mean={row['mean_ms']}ms p50={row['p50_ms']}ms "
+            f"p95={row['p95_ms']}ms commits/op={row['commits_per_op']}"
+        )
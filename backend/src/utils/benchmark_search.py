@@ -0,0 +1,138 @@
+"""Catalog search latency benchmark
+
+Runs a fixed mix of search shapes against the configured database and reports
+p50/p95/p99 latency per shape. ``--seed N`` first inserts N throwaway active
+products (with variants) so the indexes are exercised at catalog scale, and
+removes them afterwards. ``--explain`` prints each shape's query plan, to check
+that it is answered from the search indexes.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from typing import Dict, List
+
+from sqlalchemy import delete, insert, select, text
+
+from src.core.database import AsyncSessionLocal, init_db
+from src.models import Product, ProductVariant
+from src.services.catalog_search_service import build_search_query
+
+
+WORDS = ["hoodie", "shirt", "mug", "bottle", "cap", "backpack", "sticker", "notebook", "socks", "jacket"]
+ADJECTIVES = ["blue", "black", "organic", "classic", "premium", "eco", "vintage", "capyx"]
+SIZES = ["XS", "S", "M", "L", "XL"]
+COLORS = ["Black", "White", "Blue", "Green", "Red"]
+
+SEARCH_SHAPES = {
+    "text": {"q": "hood"},
+    "text_two_terms": {"q": "blue hood"},
+    "name_prefix": {"q": "Premium ba"},
+    "size_color": {"size": "M", "color": "Black"},
+    "credit_range": {"min_credits": 20, "max_credits": 40},
+    "text_and_filters": {"q": "shirt", "size": "L", "max_credits": 50},
+}
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _summary(name: str, samples: List[float], hits: int) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "shape": name,
+        "runs": len(samples),
+        "results": hits,
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2)
+    }
+
+
+async def seed_products(count: int, tag: str) -> None:
+    """Insert `count` active products named after `tag`, each with a few variants"""
+    async with AsyncSessionLocal() as db:
+        for start in range(0, count, 1000):
+            rows = [
+                {
+                    "name": f"{random.choice(ADJECTIVES).title()} {random.choice(WORDS)} {tag}-{i}",
+                    "description": f"{random.choice(ADJECTIVES)} {random.choice(WORDS)} for the capyx crew",
+                    "base_credits": float(random.randint(5, 80)),
+                    "is_active": True
+                }
+                for i in range(start, min(start + 1000, count))
+            ]
+            result = await db.execute(insert(Product).returning(Product.id), rows)
+            product_ids = result.scalars().all()
+            await db.execute(insert(ProductVariant), [
+                {
+                    "product_id": product_id,
+                    "size": size,
+                    "color": random.choice(COLORS),
+                    "credits_modifier": float(random.randint(0, 10))
+                }
+                for product_id in product_ids
+                for size in random.sample(SIZES, 3)
+            ])
+            await db.commit()
+
+
+async def drop_products(tag: str) -> None:
+    async with AsyncSessionLocal() as db:
+        seeded = select(Product.id).where(Product.name.like(f"% {tag}-%"))
+        await db.execute(delete(ProductVariant).where(ProductVariant.product_id.in_(seeded)))
+        await db.execute(delete(Product).where(Product.name.like(f"% {tag}-%")))
+        await db.commit()
+
+
+async def run_benchmark(iterations: int = 200, seed: int = 0, explain: bool = False) -> List[Dict]:
+    """Time every search shape `iterations` times"""
+    tag = uuid.uuid4().hex[:8]
+    if seed:
+        await seed_products(seed, tag)
+
+    results = []
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("ANALYZE products"))
+            await db.execute(text("ANALYZE product_variants"))
+            for name, filters in SEARCH_SHAPES.items():
+                stmt = build_search_query(**filters)
+                if explain:
+                    conn = await db.connection()
+                    sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+                    plan = await conn.exec_driver_sql(f"EXPLAIN {sql}")
+                    print(f"--- {name}\n" + "\n".join(row[0] for row in plan.all()))
+
+                samples = []
+                hits = 0
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    result = await db.execute(stmt)
+                    hits = len(result.all())
+                    samples.append(time.perf_counter() - started)
+                results.append(_summary(name, samples, hits))
+    finally:
+        if seed:
+            await drop_products(tag)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0, help="Throwaway products to insert first")
+    parser.add_argument("--explain", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    rows = asyncio.run(run_benchmark(args.iterations, args.seed, args.explain))
+    print(f"🔎 Catalog search benchmark ({args.iterations} runs per shape, {args.seed} seeded products)")
+    for row in rows:
+        print(
+            f"   - {row['shape']:<17} results={row['results']:<3} p50={row['p50_ms']}ms "
+            f"p95={row['p95_ms']}ms p99={row['p99_ms']}ms"
+        )
@@ -0,0 +1,152 @@
+"""Admin order listing serialization microbenchmark
+
+Compares the old path (hand-built dicts from ORM objects, revalidated through
+OrderWithUserResponse and encoded with json, as FastAPI does for a
+response_model) with the fast path (order_items_query() rows grouped into
+dicts by group_order_rows, encoded with orjson) on synthetic pages of 100,
+1,000 and 10,000 orders. No database is needed.
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import orjson
+from pydantic import TypeAdapter
+
+from src.models import Order, OrderItem, OrderStatus, User, UserRole
+from src.schemas.schemas import OrderWithUserResponse
+from src.services.order_listing_service import group_order_rows
+
+
+ITEMS_PER_ORDER = 3
+# One order_items_query() row: the order and its user, then one item
+OrderItemRow = namedtuple("OrderItemRow", [
+    "id", "user_id", "status", "total_credits", "created_at", "updated_at", "completed_at",
+    "user_pk", "user_email", "user_name", "user_start_date", "user_role",
+    "user_is_active", "user_created_at", "user_updated_at",
+    "item_id", "item_variant_id", "item_quantity", "item_unit_credits", "item_total_credits",
+    "item_created_at", "product_name", "variant_size", "variant_color"
+])
+
+
+def _fixtures(count: int):
+    """Build the same page both as ORM objects (old path) and as joined row tuples (new path)"""
+    now = datetime.utcnow()
+    users = [
+        User(
+            id=i, email=f"user{i}@capyx.be", name=f"User {i}", start_date=now - timedelta(days=400),
+            role=UserRole.EMPLOYEE, is_active=True, created_at=now, updated_at=now
+        )
+        for i in range(1, 51)
+    ]
+    orders, rows = [], []
+    for order_id in range(1, count + 1):
+        user = users[order_id % len(users)]
+        created_at = now - timedelta(minutes=order_id)
+        order = Order(
+            id=order_id, user_id=user.id, status=OrderStatus.PROCESSING, total_credits=60.0,
+            created_at=created_at, updated_at=created_at, completed_at=None
+        )
+        order.user = user
+        details = []
+        for n in range(ITEMS_PER_ORDER):
+            item = OrderItem(
+                id=order_id * 10 + n, order_id=order_id, variant_id=n + 1, quantity=1,
+                unit_credits=20.0, total_credits=20.0, created_at=created_at
+            )
+            order.items.append(item)
+            details.append((item, f"Product {n + 1}", "M", "Black"))
+        orders.append((order, details))
+        rows.extend(
+            OrderItemRow(
+                order_id, user.id, OrderStatus.PROCESSING, 60.0, created_at, created_at, None,
+                user.id, user.email, user.name, user.start_date, user.role, True, now, now,
+                item.id, item.variant_id, 1, 20.0, 20.0, created_at, name, size, color
+            )
+            for item, name, size, color in details
+        )
+    return orders, rows
+
+
+def old_path(orders, adapter: TypeAdapter) -> bytes:
+    enriched = []
+    for order, details in orders:
+        order_dict = {
+            'id': order.id,
+            'user_id': order.user_id,
+            'user': order.user,
+            'status': order.status,
+            'total_credits': order.total_credits,
+            'created_at': order.created_at,
+            'updated_at': order.updated_at,
+            'completed_at': order.completed_at,
+            'items': []
+        }
+        for item, product_name, size, color in details:
+            order_dict['items'].append({
+                'id': item.id,
+                'order_id': item.order_id,
+                'variant_id': item.variant_id,
+                'quantity': item.quantity,
+                'unit_credits': item.unit_credits,
+                'total_credits': item.total_credits,
+                'created_at': item.created_at,
+                'product_name': product_name,
+                'variant_size': size,
+                'variant_color': color
+            })
+        enriched.append(order_dict)
+    validated = adapter.validate_python(enriched, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def new_path(rows) -> bytes:
+    payloads: List[dict] = []
+    group_order_rows(rows, payloads)
+    return orjson.dumps(payloads)
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def run_benchmark(sizes: List[int], repeat: int = 5) -> List[Dict]:
+    adapter = TypeAdapter(List[OrderWithUserResponse])
+    results = []
+    for size in sizes:
+        orders, rows = _fixtures(size)
+        # Same document either way
+        assert json.loads(old_path(orders, adapter)) == json.loads(new_path(rows))
+        old = _time(lambda: old_path(orders, adapter), repeat)
+        new = _time(lambda: new_path(rows), repeat)
+        results.append({
+            "orders": size,
+            "old_ms": round(old * 1000, 2),
+            "new_ms": round(new * 1000, 2),
+            "speedup": round(old / new, 1) if new else None
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"⏱️  Admin order serialization (median of {args.repeat}, {ITEMS_PER_ORDER} items per order)")
+    for row in run_benchmark(args.sizes, args.repeat):
+        print(
+            f"   - {row['orders']:>6} orders  old={row['old_ms']}ms  "
+            f"new={row['new_ms']}ms  speedup={row['speedup']}x"
+        )
@@ -0,0 +1,89 @@
+"""Streaming export memory check
+
+Seeds a throwaway user with orders (several items each) and ledger entries,
+streams the order and ledger exports in both formats, then seeds four times
+as many rows and streams them again. Peak Python memory (tracemalloc) must
+not grow with the row count: each export may use at most --max-growth times
+its first peak. Exits with status 1 otherwise.
+"""
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from sqlalchemy import func, insert, select
+
+from src.core.database import AsyncSessionLocal, init_db
+from src.models import CreditLedger, CreditType
+from src.services.export_service import EXPORT_FORMATS, stream_ledger_export, stream_orders_export
+from src.utils.benchmark_checkout import create_fixture, drop_fixture
+from src.utils.check_order_queries import seed_orders
+
+
+EXPORTS = {"orders": stream_orders_export, "ledger": stream_ledger_export}
+
+
+async def seed_ledger(user_id: int, entries: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(CreditLedger), [
+            {"user_id": user_id, "amount": 1.0, "credit_type": CreditType.GRANT, "description": "Export check"}
+            for _ in range(entries)
+        ])
+        await db.commit()
+
+
+async def measure(name: str, fmt: str, start) -> Dict:
+    """Stream one export to nowhere, returning its size, time and peak memory"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = lines = 0
+    async for chunk in EXPORTS[name](fmt, start):
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"export": f"{name}.{fmt}", "lines": lines, "mb": size / 1e6, "seconds": elapsed, "peak_kb": peak / 1024}
+
+
+async def run_check(orders: int = 5000, items: int = 3) -> List[Dict]:
+    """Measure every export at `orders` and at 4 x `orders` seeded orders"""
+    user_id, product_id, variant_id = await create_fixture(credits=0.0, stock=0)
+    rounds = []
+    try:
+        async with AsyncSessionLocal() as db:
+            start = await db.scalar(select(func.now()))
+        for extra in (orders, orders * 3):
+            await seed_orders(user_id, variant_id, extra, items)
+            await seed_ledger(user_id, extra * items)
+            rounds.append([await measure(name, fmt, start) for name in EXPORTS for fmt in EXPORT_FORMATS])
+    finally:
+        await drop_fixture(user_id, product_id, variant_id)
+    return rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=3, help="Items per order")
+    parser.add_argument("--max-growth", type=float, default=1.5)
+    args = parser.parse_args()
+
+    init_db()
+    small, large = asyncio.run(run_check(args.orders, args.items))
+    print(f"📤 Streaming exports ({args.orders} then {args.orders * 4} orders, {args.items} items each)")
+    failed = False
+    for first, second in zip(small, large):
+        ok = second["peak_kb"] <= first["peak_kb"] * args.max_growth
+        failed = failed or not ok
+        print(
+            f"   {'✅' if ok else '❌'} {first['export']:<14} "
+            f"{first['lines']:>7} → {second['lines']:>7} lines  "
+            f"{second['mb']:6.1f} MB in {second['seconds']:.2f}s  "
+            f"peak {first['peak_kb']:,.0f} → {second['peak_kb']:,.0f} KiB"
+        )
+    if failed:
+        print(f"❌ Export memory grew more than {args.max_growth}x with 4x the rows")
+        sys.exit(1)
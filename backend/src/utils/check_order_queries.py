@@ -0,0 +1,146 @@
+"""Admin order enrichment query-count check
+
+Seeds a throwaway user with orders of several items each, then loads the
+page shapes used by /admin/orders and /admin/orders/processing through
+load_order_payloads while counting the SQL statements sent. Each shape must
+take exactly one statement whatever the page size, and every order must come
+back with all of its items. The fulfil endpoint is run whole, and may read at
+most EXPECTED_FULFIL_READS statements after its commit (stock event and
+response payload). Exits with status 1 otherwise.
+"""
+import argparse
+import asyncio
+import sys
+from typing import Dict, List
+
+import orjson
+from sqlalchemy import event, insert, update
+
+from src.core.database import AsyncSessionLocal, async_engine, init_db
+from src.core.pagination import paginate
+from src.api.admin import fulfill_order_endpoint
+from src.models import InventoryLot, Order, OrderItem, OrderStatus
+from src.services.order_listing_service import load_order_payloads, order_rows_query
+from src.utils.benchmark_checkout import create_fixture, drop_fixture
+
+
+EXPECTED_STATEMENTS = 1
+EXPECTED_FULFIL_READS = 2
+
+
+class StatementCounter:
+    """Counts statements executed on the async engine, and where the last COMMIT fell"""
+
+    def __init__(self):
+        self.count = 0
+        self.count_at_commit = 0
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(async_engine.sync_engine, "commit", self._on_commit)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def _on_commit(self, conn):
+        self.count_at_commit = self.count
+
+    def close(self):
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.remove(async_engine.sync_engine, "commit", self._on_commit)
+
+
+async def seed_orders(user_id: int, variant_id: int, orders: int, items: int) -> None:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            insert(Order).returning(Order.id),
+            [
+                {"user_id": user_id, "status": OrderStatus.PROCESSING, "total_credits": float(items)}
+                for _ in range(orders)
+            ]
+        )
+        order_ids = result.scalars().all()
+        await db.execute(insert(OrderItem), [
+            {"order_id": order_id, "variant_id": variant_id, "quantity": 1, "unit_credits": 1.0, "total_credits": 1.0}
+            for order_id in order_ids
+            for _ in range(items)
+        ])
+        await db.commit()
+
+
+async def run_check(orders: int = 120, items: int = 3) -> List[Dict]:
+    """Count statements per page shape over `orders` seeded orders"""
+    user_id, product_id, variant_id = await create_fixture(credits=0.0, stock=0)
+    counter = StatementCounter()
+    results = []
+    try:
+        await seed_orders(user_id, variant_id, orders, items)
+        own_orders = order_rows_query().where(Order.user_id == user_id)
+        shapes = {
+            f"orders limit={limit}": paginate(own_orders, Order, limit)
+            for limit in (1, 10, 100)
+        }
+        shapes["processing"] = own_orders.where(
+            Order.status == OrderStatus.PROCESSING
+        ).order_by(Order.created_at.desc(), Order.id.desc())
+
+        for name, stmt in shapes.items():
+            async with AsyncSessionLocal() as db:
+                before = counter.count
+                payloads = await load_order_payloads(db, stmt)
+                statements = counter.count - before
+            results.append({
+                "shape": name,
+                "orders": len(payloads),
+                "statements": statements,
+                "complete": all(len(order["items"]) == items for order in payloads)
+            })
+
+        # The whole fulfil endpoint, with stock reserved for one order
+        order_id = payloads[0]["id"]
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(InventoryLot).where(InventoryLot.variant_id == variant_id)
+                .values(quantity=items, reserved_quantity=items)
+            )
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            response = await fulfill_order_endpoint(order_id, None, db)
+            order = orjson.loads(response.body)
+            results.append({
+                "shape": "fulfil",
+                "orders": 1,
+                "statements": counter.count - counter.count_at_commit,
+                "expected": EXPECTED_FULFIL_READS,
+                "complete": order["status"] == "completed" and len(order["items"]) == items
+            })
+    finally:
+        counter.close()
+        await drop_fixture(user_id, product_id, variant_id)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=120)
+    parser.add_argument("--items", type=int, default=3, help="Items per order")
+    args = parser.parse_args()
+
+    init_db()
+    rows = asyncio.run(run_check(args.orders, args.items))
+    print(f"🔢 Admin order enrichment ({args.orders} orders, {args.items} items each)")
+    failed = False
+    for row in rows:
+        expected = row.get("expected")
+        within = row["statements"] <= expected if expected else row["statements"] == EXPECTED_STATEMENTS
+        ok = within and row["complete"]
+        failed = failed or not ok
+        print(
+            f"   {'✅' if ok else '❌'} {row['shape']:<17} orders={row['orders']:<4} "
+            f"statements={row['statements']}"
+        )
+    if failed:
+        print(
+            f"❌ Expected {EXPECTED_STATEMENTS} statement per page and at most "
+            f"{EXPECTED_FULFIL_READS} reads after the fulfil commit, with every item loaded"
+        )
+        sys.exit(1)
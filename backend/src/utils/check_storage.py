@@ -0,0 +1,95 @@
+"""Image storage round-trip check
+
+Exercises the configured storage backend end to end: upload through the API
+path, presigned direct upload and confirmation (object storage only),
+download through /uploads/<key>, and deletion. Point it at a local MinIO to
+try the S3 backend without AWS, e.g.
+
+    docker compose --profile s3 up -d minio
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://localhost:9000 \\
+    S3_ACCESS_KEY_ID=minioadmin S3_SECRET_ACCESS_KEY=minioadmin \\
+    python -m src.utils.check_storage
+"""
+import asyncio
+import hashlib
+import io
+import os
+import urllib.error
+import urllib.request
+
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from src.core.config import settings
+from src.utils.file_storage import (
+    confirm_direct_upload, delete_file, presign_image_upload, save_upload_file
+)
+from src.utils.storage import get_storage
+
+
+def _sample_png() -> bytes:
+    """A valid PNG header followed by random bytes, unique per run"""
+    return b"\x89PNG\r\n\x1a\n" + os.urandom(2048)
+
+
+def _http(method: str, url: str, body: bytes = None, headers: dict = None):
+    request = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    with urllib.request.urlopen(request) as response:
+        return response.status, response.read()
+
+
+async def check_api_upload(client: TestClient) -> str:
+    data = _sample_png()
+    image_url = await save_upload_file(UploadFile(io.BytesIO(data), filename="check.png"))
+    assert image_url == f"/uploads/{hashlib.sha256(data).hexdigest()}.png", image_url
+
+    response = client.get(image_url, follow_redirects=False)
+    if response.status_code in (307, 308):
+        _, body = _http("GET", response.headers["location"])
+    else:
+        body = response.content
+    assert body == data, "downloaded bytes differ"
+    print(f"   ✅ API upload and download ({response.status_code})")
+    return image_url
+
+
+async def check_direct_upload() -> str:
+    data = _sample_png()
+    digest = hashlib.sha256(data).hexdigest()
+    upload = await presign_image_upload("image/png", len(data), digest)
+    status, _ = _http(upload["method"], upload["upload_url"], data, upload["headers"])
+    assert status == 200, status
+    image_url = await confirm_direct_upload(upload["image_url"])
+    print("   ✅ Presigned upload confirmed")
+
+    # A body that does not match the presigned checksum must be refused by the store
+    tampered = await presign_image_upload("image/png", len(data), hashlib.sha256(b"other").hexdigest())
+    try:
+        _http(tampered["method"], tampered["upload_url"], data, tampered["headers"])
+    except urllib.error.HTTPError as e:
+        print(f"   ✅ Mismatched checksum rejected ({e.code})")
+    else:
+        raise AssertionError("store accepted a body that does not match its checksum")
+    return image_url
+
+
+async def run_checks() -> None:
+    storage = get_storage()
+    await storage.prepare()
+    print(f"🪣 Checking {settings.storage_backend} storage")
+    # Only the /uploads mount of the app, so no database is needed
+    client = TestClient(Starlette(routes=[Mount("/uploads", storage.asgi_app())]))
+    
+    uploaded = [await check_api_upload(client)]
+    if storage.supports_direct_upload:
+        uploaded.append(await check_direct_upload())
+    for image_url in uploaded:
+        await delete_file(image_url)
+        assert await storage.stat(image_url.rsplit("/", 1)[-1]) is None
+    print("   ✅ Deleted")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_checks())
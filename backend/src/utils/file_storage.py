@@ -1,19 +1,37 @@
 """File storage utilities for handling image uploads"""
+import asyncio
+import base64
+import hashlib
 import os
+import re
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Optional
+
+import aiofiles
+import aiofiles.os
 from fastapi import UploadFile
-import shutil
 
-# Configure upload directory
-UPLOAD_DIR = Path("/app/uploads")
-if not UPLOAD_DIR.exists():
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+from src.utils.storage import get_storage
 
 # Allowed image extensions
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+CONTENT_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".gif": "image/gif", ".webp": "image/webp"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Derived images, written next to the original as <hash><suffix>
+THUMBNAIL_SIZE = (400, 400)
+THUMBNAIL_SUFFIX = "_thumb.webp"
+WEBP_SUFFIX = ".webp"
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+# Keys a direct upload may claim: <sha256><ext>
+DIRECT_UPLOAD_KEY = re.compile(r"^/uploads/([0-9a-f]{64}(\.jpg|\.png|\.gif|\.webp))$")
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+_pending_variants = set()
 
 
 def is_valid_image(filename: str) -> bool:
@@ -22,9 +40,76 @@ def is_valid_image(filename: str) -> bool:
     return ext in ALLOWED_EXTENSIONS
 
 
+def detect_image_type(header: bytes) -> Optional[str]:
+    """Return the file extension matching an image's magic bytes, or None"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _render_variants(path: str) -> None:
+    """Write the thumbnail and WebP copies of an image (runs in the image process pool)"""
+    from PIL import Image
+    
+    source = Path(path)
+    stem = source.with_suffix("")
+    with Image.open(source) as image:
+        image.seek(0)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        if source.suffix != WEBP_SUFFIX:
+            image.save(f"{stem}{WEBP_SUFFIX}", "WEBP", quality=85, method=4)
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.save(f"{stem}{THUMBNAIL_SUFFIX}", "WEBP", quality=80, method=4)
+
+
+def _get_image_pool() -> ProcessPoolExecutor:
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _image_pool
+
+
+def shutdown_image_pool() -> None:
+    """Stop the image worker processes (on application shutdown)"""
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+
+def schedule_variants(file_path: Path) -> None:
+    """Render an image's variants in the process pool without waiting for them"""
+    try:
+        import PIL  # noqa: F401  (optional: without Pillow only the original is kept)
+    except ImportError:
+        return
+    
+    future = asyncio.get_running_loop().run_in_executor(
+        _get_image_pool(), _render_variants, str(file_path)
+    )
+    _pending_variants.add(future)
+    
+    def _done(done: asyncio.Future) -> None:
+        _pending_variants.discard(done)
+        if not done.cancelled() and done.exception():
+            print(f"⚠️  Image variants failed for {file_path.name}: {done.exception()}")
+    
+    future.add_done_callback(_done)
+
+
 async def save_upload_file(upload_file: UploadFile) -> str:
     """
-    Save uploaded file to disk and return the file path
+    Stream an uploaded image into storage under its content hash and return its path
+    
+    The type is taken from the file's magic bytes, not its name. Identical
+    uploads share one file. On local storage, thumbnail and WebP variants are
+    rendered in a process pool afterwards.
     
     Args:
         upload_file: FastAPI UploadFile object
@@ -35,62 +120,127 @@ async def save_upload_file(upload_file: UploadFile) -> str:
     Raises:
         ValueError: If file type is invalid or file too large
     """
-    if not is_valid_image(upload_file.filename):
-        raise ValueError(f"Invalid file type. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}")
-    
-    # Generate unique filename
-    file_ext = Path(upload_file.filename).suffix.lower()
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = UPLOAD_DIR / unique_filename
+    storage = get_storage()
+    temp_path = storage.scratch_dir / f".upload-{uuid.uuid4().hex}"
+    digest = hashlib.sha256()
+    size = 0
     
-    # Save file
     try:
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
+        chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+        file_ext = detect_image_type(chunk)
+        if file_ext is None:
+            raise ValueError(f"Invalid file type. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}")
+        
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            while chunk:
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise ValueError(f"File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB")
+                digest.update(chunk)
+                await buffer.write(chunk)
+                chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+        
+        filename = f"{digest.hexdigest()}{file_ext}"
+        # Same content already stored: the existing file and its variants are kept
+        created = await storage.store(filename, temp_path, CONTENT_TYPES[file_ext])
+        file_path = storage.local_path(filename)
+        if created and file_path is not None:
+            schedule_variants(file_path)
+    except BaseException:
+        if await aiofiles.os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+        raise
     finally:
-        upload_file.file.close()
+        await upload_file.close()
     
     # Return relative path
-    return f"/uploads/{unique_filename}"
+    return f"/uploads/{filename}"
 
 
-def delete_file(file_path: str) -> bool:
+async def presign_image_upload(content_type: str, size: int, sha256_hex: str) -> dict:
     """
-    Delete a file from storage
+    Prepare a direct-to-storage upload of an image the client has hashed
     
-    Args:
-        file_path: Relative path to file (e.g., /uploads/filename.jpg)
-        
-    Returns:
-        bool: True if deleted successfully, False otherwise
+    Returns the image path to send with the product, plus the presigned
+    request to make first. `upload_url` is None when the same image is
+    already stored.
+    
+    Raises:
+        ValueError: If the type, size or hash is invalid, or storage is local
     """
-    if not file_path or not file_path.startswith("/uploads/"):
-        return False
+    file_ext = next((ext for ext, known in CONTENT_TYPES.items() if known == content_type), None)
+    if file_ext is None:
+        raise ValueError(f"Invalid content type. Allowed types: {', '.join(CONTENT_TYPES.values())}")
+    if not 0 < size <= MAX_FILE_SIZE:
+        raise ValueError(f"File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB")
+    sha256_hex = sha256_hex.lower()
+    if not re.fullmatch(r"[0-9a-f]{64}", sha256_hex):
+        raise ValueError("sha256 must be 64 hex characters")
     
-    try:
-        full_path = UPLOAD_DIR / Path(file_path).name
-        if full_path.exists():
-            full_path.unlink()
-            return True
-    except Exception:
-        pass
+    storage = get_storage()
+    if not storage.supports_direct_upload:
+        raise ValueError("Direct uploads need object storage (STORAGE_BACKEND=s3)")
+    key = f"{sha256_hex}{file_ext}"
+    if await storage.stat(key) is not None:
+        return {"image_url": f"/uploads/{key}", "upload_url": None, "method": "PUT", "headers": {}, "expires_in": 0}
+    upload = await storage.presign_upload(key, content_type, size, sha256_hex)
+    return {"image_url": f"/uploads/{key}", **upload}
+
+
+async def confirm_direct_upload(image_url: str) -> str:
+    """
+    Check an image uploaded with presign_image_upload before a product uses it
     
-    return False
+    The object must exist, fit MAX_FILE_SIZE and start with the magic bytes
+    of its extension. The presigned PUT signs the SHA-256 checksum its key
+    names, so the store refuses other bytes; when the store reports the
+    checksum back it must match too. Objects that fail are deleted.
+    
+    Raises:
+        ValueError: If the image is missing or invalid
+    """
+    match = DIRECT_UPLOAD_KEY.match(image_url or "")
+    if not match:
+        raise ValueError("image_url must be a path returned by the upload presign endpoint")
+    key, file_ext = match.groups()
+    
+    storage = get_storage()
+    stored = await storage.stat(key)
+    if stored is None:
+        raise ValueError("Image has not been uploaded")
+    
+    expected_checksum = base64.b64encode(bytes.fromhex(key[:64])).decode()
+    valid = (
+        stored.size <= MAX_FILE_SIZE
+        and stored.checksum_sha256 in (None, expected_checksum)
+        and detect_image_type(await storage.read_head(key, 16)) == file_ext
+    )
+    if not valid:
+        await storage.delete(key)
+        raise ValueError("Uploaded image is invalid")
+    return image_url
 
 
-def get_file_path(relative_path: str) -> Optional[Path]:
+async def delete_file(file_path: str) -> bool:
     """
-    Get full file path from relative path
+    Delete a file (and its derived variants) from storage
     
     Args:
-        relative_path: Relative path (e.g., /uploads/filename.jpg)
+        file_path: Relative path to file (e.g., /uploads/filename.jpg)
         
     Returns:
-        Path object or None if invalid
+        bool: True if deleted successfully, False otherwise
     """
-    if not relative_path or not relative_path.startswith("/uploads/"):
-        return None
+    if not file_path or not file_path.startswith("/uploads/"):
+        return False
     
-    full_path = UPLOAD_DIR / Path(relative_path).name
-    return full_path if full_path.exists() else None
-
+    key = Path(file_path).name
+    stem = Path(key).stem
+    try:
+        for name in {key, f"{stem}{THUMBNAIL_SUFFIX}", f"{stem}{WEBP_SUFFIX}"}:
+            await get_storage().delete(name)
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not delete {file_path}: {e}")
+    
+    return False
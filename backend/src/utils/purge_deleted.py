@@ -0,0 +1,27 @@
+"""Purge soft-deleted products and variants now (the API also does this in the background)"""
+import argparse
+import asyncio
+
+from src.core.config import settings
+from src.core.database import init_db
+from src.services.purge_service import run_purge
+
+
+async def purge(batch_size: int) -> dict:
+    """Run every purge step and print what was removed"""
+    summary = await run_purge(batch_size)
+    print(f"🧹 Purge of soft-deleted products (batches of {batch_size})")
+    print(f"   - Order items of deleted products: {summary['order_items']}")
+    print(f"   - Orders emptied by those deletes: {summary['orders']}")
+    print(f"   - Variants: {summary['variants']}")
+    print(f"   - Products: {summary['products']}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=settings.purge_batch_size)
+    args = parser.parse_args()
+    
+    init_db()
+    asyncio.run(purge(args.batch_size))
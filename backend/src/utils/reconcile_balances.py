@@ -0,0 +1,35 @@
+"""Recompute materialized user balances from the credit ledger and report drift"""
+import argparse
+import asyncio
+
+from src.core.database import AsyncSessionLocal, init_db
+from src.services.credit_service import reconcile_balances
+
+
+async def run_reconciliation(apply: bool = False) -> int:
+    """Run the reconciliation and print a drift report; returns the drift count"""
+    async with AsyncSessionLocal() as db:
+        drift = await reconcile_balances(db, apply=apply)
+    
+    if not drift:
+        print("✅ All balances match the credit ledger")
+        return 0
+    
+    print(f"⚠️  {len(drift)} balance(s) drifted from the credit ledger:")
+    for row in drift:
+        print(
+            f"   - user {row['user_id']}: stored={row['stored_balance']} "
+            f"ledger={row['ledger_balance']}"
+        )
+    if apply:
+        print("🔧 Drifted balances were reset to the ledger totals")
+    return len(drift)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--apply", action="store_true", help="Repair drifted balances")
+    args = parser.parse_args()
+    
+    init_db()
+    asyncio.run(run_reconciliation(apply=args.apply))
@@ -2,7 +2,7 @@
 from datetime import datetime
 
 from src.core.database import SessionLocal, init_db
-from src.models import User, CreditLedger, UserRole, CreditType
+from src.models import User, CreditLedger, UserRole, CreditType, UserBalance
 
 
 def seed_database():
@@ -65,6 +65,7 @@ def seed_database():
                 description=f"Initial credits for {user.role.value}"
             )
             db.add(ledger)
+            db.add(UserBalance(user_id=user.id, balance=credit_amount))
         
         db.commit()
         
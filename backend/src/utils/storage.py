@@ -0,0 +1,270 @@
+"""
+Image storage backends
+
+Stored images are addressed by key, a bare file name such as
+"<sha256>.png". Product.image_url is always "/uploads/<key>", whichever
+backend holds the bytes, so switching backends needs no data migration
+beyond copying the files.
+
+- LocalStorage keeps files in UPLOAD_DIR. On more than one replica, that
+  directory must be a shared volume.
+- S3Storage keeps them in an S3-compatible bucket (AWS S3, or MinIO
+  locally). /uploads/<key> redirects to a presigned or public URL, and
+  admins can PUT images straight into the bucket with a presigned upload.
+  Either way the image bytes never pass through the API.
+
+STORAGE_BACKEND selects the backend.
+"""
+import asyncio
+import base64
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiofiles
+import aiofiles.os
+
+from src.core.config import settings
+from src.utils.upload_files import UPLOAD_CACHE_CONTROL, UploadFiles, UploadRedirects
+
+
+class StoredObject:
+    """Size and, when the store recorded one, base64 SHA-256 checksum of a stored key"""
+
+    def __init__(self, size: int, checksum_sha256: Optional[str] = None):
+        self.size = size
+        self.checksum_sha256 = checksum_sha256
+
+
+class Storage(ABC):
+    """Interface of the image storage backends"""
+
+    supports_direct_upload = False
+
+    @property
+    @abstractmethod
+    def scratch_dir(self) -> Path:
+        """Local directory for uploads still being received"""
+
+    async def prepare(self) -> None:
+        """Create whatever the backend needs (called on startup)"""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        """Return the stored object's metadata, or None if the key is missing"""
+
+    @abstractmethod
+    async def store(self, key: str, source: Path, content_type: str) -> bool:
+        """
+        Move a finished local file to `key`, consuming `source`
+
+        Returns False when the key already existed (content-addressed keys
+        hold the same bytes, so the existing object is kept).
+        """
+
+    @abstractmethod
+    async def read_head(self, key: str, length: int) -> bytes:
+        """Return the first `length` bytes of a stored object"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete a key; missing keys are ignored"""
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Path of the key on this machine, for backends that have one"""
+        return None
+
+    @abstractmethod
+    def download_url(self, key: str) -> str:
+        """URL a client can fetch the object from directly"""
+
+    async def presign_upload(self, key: str, content_type: str, size: int, sha256_hex: str) -> Dict:
+        """Return the URL, method and headers for a direct upload of `key`"""
+        raise ValueError("Direct uploads need object storage (STORAGE_BACKEND=s3)")
+
+    @abstractmethod
+    def asgi_app(self):
+        """ASGI app mounted at /uploads"""
+
+
+class LocalStorage(Storage):
+    """Images as files in a directory"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def scratch_dir(self) -> Path:
+        # Same filesystem as the final location, so store() is an atomic rename
+        return self.directory
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            result = await aiofiles.os.stat(self.directory / key)
+        except FileNotFoundError:
+            return None
+        return StoredObject(result.st_size)
+
+    async def store(self, key: str, source: Path, content_type: str) -> bool:
+        target = self.directory / key
+        if await aiofiles.os.path.exists(target):
+            await aiofiles.os.remove(source)
+            return False
+        await aiofiles.os.replace(source, target)
+        return True
+
+    async def read_head(self, key: str, length: int) -> bytes:
+        async with aiofiles.open(self.directory / key, "rb") as file:
+            return await file.read(length)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await aiofiles.os.remove(self.directory / key)
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self.directory / key
+
+    def download_url(self, key: str) -> str:
+        return f"/uploads/{key}"
+
+    def asgi_app(self):
+        return UploadFiles(directory=str(self.directory))
+
+
+class S3Storage(Storage):
+    """Images as objects in an S3-compatible bucket (boto3 calls run in threads)"""
+
+    supports_direct_upload = True
+
+    def __init__(self):
+        import boto3
+        from botocore.config import Config
+
+        options = {
+            "region_name": settings.s3_region,
+            # Path-style addressing works for MinIO as well as AWS
+            "config": Config(signature_version="s3v4", s3={"addressing_style": "path"})
+        }
+        if settings.s3_access_key_id:
+            options["aws_access_key_id"] = settings.s3_access_key_id
+            options["aws_secret_access_key"] = settings.s3_secret_access_key
+
+        self.bucket = settings.s3_bucket
+        self.client = boto3.client("s3", endpoint_url=settings.s3_endpoint_url or None, **options)
+        # Presigning is offline, so a client for the browser-facing endpoint costs nothing
+        presign_endpoint = settings.s3_presign_endpoint_url or settings.s3_endpoint_url
+        self.presign_client = boto3.client("s3", endpoint_url=presign_endpoint or None, **options)
+
+    @property
+    def scratch_dir(self) -> Path:
+        return Path(tempfile.gettempdir())
+
+    @staticmethod
+    def _is_missing(error) -> bool:
+        code = error.response.get("Error", {}).get("Code", "")
+        return code in ("404", "NoSuchKey", "NoSuchBucket", "NotFound")
+
+    async def prepare(self) -> None:
+        from botocore.exceptions import ClientError
+
+        try:
+            await asyncio.to_thread(self.client.head_bucket, Bucket=self.bucket)
+        except ClientError as e:
+            if not self._is_missing(e):
+                raise
+            await asyncio.to_thread(self.client.create_bucket, Bucket=self.bucket)
+            print(f"🪣 Created storage bucket {self.bucket}")
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = await asyncio.to_thread(
+                self.client.head_object, Bucket=self.bucket, Key=key, ChecksumMode="ENABLED"
+            )
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return StoredObject(head["ContentLength"], head.get("ChecksumSHA256"))
+
+    async def store(self, key: str, source: Path, content_type: str) -> bool:
+        try:
+            if await self.stat(key) is not None:
+                return False
+            await asyncio.to_thread(
+                self.client.upload_file, str(source), self.bucket, key,
+                ExtraArgs={"ContentType": content_type, "CacheControl": UPLOAD_CACHE_CONTROL}
+            )
+            return True
+        finally:
+            await aiofiles.os.remove(source)
+
+    async def read_head(self, key: str, length: int) -> bytes:
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=key, Range=f"bytes=0-{length - 1}"
+        )
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    def download_url(self, key: str) -> str:
+        if settings.s3_public_url:
+            return f"{settings.s3_public_url.rstrip('/')}/{key}"
+        return self.presign_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=settings.s3_presign_expiry_seconds
+        )
+
+    async def presign_upload(self, key: str, content_type: str, size: int, sha256_hex: str) -> Dict:
+        # The store verifies the body against this checksum, so the key really is its content hash
+        checksum = base64.b64encode(bytes.fromhex(sha256_hex)).decode()
+        url = self.presign_client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+                "ContentLength": size,
+                "CacheControl": UPLOAD_CACHE_CONTROL,
+                "ChecksumSHA256": checksum
+            },
+            ExpiresIn=settings.s3_presign_expiry_seconds
+        )
+        return {
+            "upload_url": url,
+            "method": "PUT",
+            "headers": {
+                "Content-Type": content_type,
+                "Cache-Control": UPLOAD_CACHE_CONTROL,
+                "x-amz-checksum-sha256": checksum
+            },
+            "expires_in": settings.s3_presign_expiry_seconds
+        }
+
+    def asgi_app(self):
+        cache_seconds = None if settings.s3_public_url else settings.s3_presign_expiry_seconds // 2
+        return UploadRedirects(self.download_url, cache_seconds)
+
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """Return the configured storage backend (created on first use)"""
+    global _storage
+    if _storage is None:
+        backend = settings.storage_backend.lower()
+        if backend == "local":
+            _storage = LocalStorage(settings.upload_dir)
+        elif backend == "s3":
+            _storage = S3Storage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.storage_backend}")
+    return _storage
@@ -0,0 +1,94 @@
+"""Concurrent checkout stress test (double-spend check)
+
+Fires N orders in parallel for one user whose balance only covers part of
+them, then reports throughput and checks that the balance never went
+negative: neither the materialized balance nor any running total over the
+user's ledger. Exits with status 1 if it did.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict
+
+from sqlalchemy import select
+
+from src.core.database import AsyncSessionLocal, init_db
+from src.models import CreditLedger, User
+from src.schemas.schemas import OrderCreate, OrderItemCreate
+from src.services import order_service
+from src.services.credit_service import get_user_balance
+from src.utils.benchmark_checkout import create_fixture, drop_fixture
+
+
+async def _place(user_id: int, order_data: OrderCreate) -> bool:
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        try:
+            await order_service.process_order(db, user, order_data)
+        except ValueError:
+            return False
+        return True
+
+
+async def run_stress(orders: int = 100, affordable: int = 50) -> Dict:
+    """Place `orders` one-credit orders at once with credits for only `affordable`"""
+    user_id, product_id, variant_id = await create_fixture(
+        credits=float(affordable), stock=orders
+    )
+    order_data = OrderCreate(items=[OrderItemCreate(variant_id=variant_id, quantity=1)])
+
+    try:
+        started = time.perf_counter()
+        results = await asyncio.gather(*[_place(user_id, order_data) for _ in range(orders)])
+        elapsed = time.perf_counter() - started
+
+        async with AsyncSessionLocal() as db:
+            balance = await get_user_balance(db, user_id)
+            result = await db.execute(
+                select(CreditLedger.amount).where(
+                    CreditLedger.user_id == user_id
+                ).order_by(CreditLedger.created_at, CreditLedger.id)
+            )
+            running = 0.0
+            lowest = 0.0
+            for amount in result.scalars().all():
+                running += amount
+                lowest = min(lowest, running)
+    finally:
+        await drop_fixture(user_id, product_id, variant_id)
+
+    return {
+        "orders": orders,
+        "accepted": sum(results),
+        "rejected": len(results) - sum(results),
+        "seconds": round(elapsed, 3),
+        "orders_per_second": round(orders / elapsed, 1) if elapsed else None,
+        "final_balance": balance,
+        "ledger_balance": round(running, 6),
+        "lowest_running_balance": round(lowest, 6)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--affordable", type=int, default=50, help="Orders the user's balance covers")
+    args = parser.parse_args()
+
+    init_db()
+    report = asyncio.run(run_stress(args.orders, args.affordable))
+    print(f"⚡ Concurrent checkout: {report['orders']} orders in {report['seconds']}s "
+          f"({report['orders_per_second']} orders/s)")
+    print(f"   - accepted={report['accepted']} rejected={report['rejected']}")
+    print(f"   - final balance={report['final_balance']} ledger={report['ledger_balance']} "
+          f"lowest running={report['lowest_running_balance']}")
+
+    if (
+        report["final_balance"] < 0
+        or report["lowest_running_balance"] < 0
+        or report["accepted"] > args.affordable
+    ):
+        print("❌ Double spend detected")
+        sys.exit(1)
+    print("✅ Balance never went negative")
@@ -0,0 +1,167 @@
+"""
+Serving of uploaded images
+
+Uploads are stored under the sha256 of their bytes and never rewritten, so a
+URL always names the same content: responses are cacheable for a year as
+immutable, and the file name doubles as a strong ETag. Conditional GETs get a
+304 and single byte ranges a 206.
+
+In production nginx serves /uploads/ straight from disk. When requests do
+reach the app behind nginx, setting UPLOADS_ACCEL_REDIRECT (e.g. /_uploads/)
+makes it answer with an X-Accel-Redirect header only, and nginx sends the
+bytes from its internal location. With object storage, /uploads/<key>
+redirects to the store instead (UploadRedirects).
+"""
+import os
+import re
+from typing import Callable, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, RedirectResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from src.core.config import settings
+
+
+UPLOAD_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# A bare stored file name: no directories, no dot files
+_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into inclusive (start, end)
+
+    Returns None when the header should be ignored (malformed or several
+    ranges), in which case the whole file is sent. Raises ValueError when
+    the range cannot be satisfied.
+    """
+    match = _RANGE_PATTERN.match(range_header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class FileRangeResponse(FileResponse):
+    """206 response carrying bytes start..end (inclusive) of a file"""
+
+    def __init__(self, path, start: int, end: int, stat_result: os.stat_result, **kwargs):
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+        headers["content-length"] = str(end - start + 1)
+        super().__init__(path, status_code=206, headers=headers, stat_result=stat_result, **kwargs)
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            remaining = self.end - self.start + 1
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining = remaining - len(chunk) if chunk else 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles for the upload directory: immutable caching, ranges, X-Accel-Redirect"""
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        name = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        headers = {
+            "cache-control": UPLOAD_CACHE_CONTROL,
+            "etag": f'"{name}"',
+            "accept-ranges": "bytes"
+        }
+
+        if settings.uploads_accel_redirect:
+            # nginx streams the file (and handles ranges/conditionals) itself
+            headers["x-accel-redirect"] = settings.uploads_accel_redirect.rstrip("/") + "/" + quote(name)
+            return Response(status_code=status_code, headers=headers)
+
+        request_headers = Headers(scope=scope)
+        method = scope["method"]
+        response = FileResponse(
+            full_path, status_code=status_code, headers=headers, stat_result=stat_result, method=method
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if not range_header or (if_range and if_range not in (headers["etag"], response.headers["last-modified"])):
+            return response
+
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "content-range": f"bytes */{stat_result.st_size}"}
+            )
+        if byte_range is None:
+            return response
+        start, end = byte_range
+        return FileRangeResponse(
+            full_path, start, end, stat_result=stat_result, headers=headers, method=method
+        )
+
+
+class UploadRedirects:
+    """
+    ASGI app for /uploads when images live in object storage
+
+    Redirects each key to the URL given by `download_url` (presigned or
+    public). With no `cache_seconds`, the URL is permanent and the redirect
+    is cached as immutable.
+    """
+
+    def __init__(self, download_url: Callable[[str], str], cache_seconds: Optional[int] = None):
+        self.download_url = download_url
+        self.cache_seconds = cache_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        key = scope["path"].lstrip("/")
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+        elif not _KEY_PATTERN.match(key):
+            response = PlainTextResponse("Not Found", status_code=404)
+        elif self.cache_seconds is None:
+            response = RedirectResponse(
+                self.download_url(key), status_code=308, headers={"cache-control": UPLOAD_CACHE_CONTROL}
+            )
+        else:
+            response = RedirectResponse(
+                self.download_url(key), status_code=307,
+                headers={"cache-control": f"private, max-age={self.cache_seconds}"}
+            )
+        await response(scope, receive, send)